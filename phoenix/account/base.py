@@ -12,6 +12,8 @@ from authomatic.adapters import WebObAdapter
 
 from phoenix.security import Admin, Guest, authomatic
 from phoenix.security import check_csrf_token
+from phoenix.events import UserChanged
+from phoenix.dashboard.stats import user_logged_in, user_added, user_group_changed
 from phoenix.twitcherclient import generate_access_token
 
 
@@ -97,6 +99,7 @@ class Account(object):
             creation_time=datetime.now(),
             last_login=datetime.now())
         self.collection.save(user)
+        user_added(self.request.db, user['group'])
         return self.collection.find_one({'identifier': user['identifier']})
 
     def login(self):
@@ -116,12 +119,16 @@ class Account(object):
             message = 'Please check the activation of the user {} on the Phoenix host {}.'.format(
                 user['name'], self.request.server_name)
             self.send_notification(email, subject, message)
+        group = user.get('group')
         if local:
             user['group'] = Admin
         user['last_login'] = datetime.now()
         user['openid'] = openid or ''
         user['name'] = name or 'Guest'
         self.collection.update({'login_id': login_id}, user)
+        self.request.registry.notify(UserChanged(self.request.registry, user['identifier']))
+        user_logged_in(self.request.db, user['identifier'])
+        user_group_changed(self.request.db, group, user.get('group'))
         self.session.flash("Hello <strong>{0}</strong>. Welcome to Phoenix.".format(escape(name)), queue='info')
         if user.get('group') == Guest:
             msg = """
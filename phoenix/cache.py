@@ -0,0 +1,119 @@
+"""
+In-process caches shared by all requests of a worker.
+
+Caches are registered by name at the pyramid registry and can be configured
+with the settings ``phoenix.cache.<name>.ttl`` (seconds) and
+``phoenix.cache.<name>.max_size`` (number of entries).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+_lock = threading.Lock()
+_marker = object()
+
+
+class TTLCache(object):
+    """
+    Thread-safe LRU cache where every entry expires after ``ttl`` seconds.
+
+    Values are computed outside of the lock, so a slow ``creator`` does not
+    block readers of other keys.
+    """
+
+    def __init__(self, ttl=300, max_size=128, timer=time.time):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _marker, count=False) is not _marker
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.timer():
+                    self._data.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return value
+                del self._data[key]
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Cache ``value`` for ``ttl`` seconds, by default the ttl of the cache."""
+        with self._lock:
+            self._data[key] = (self.timer() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return value
+
+    def get_or_create(self, key, creator):
+        """
+        Return cached value for ``key`` or call ``creator`` and cache its result.
+        Exceptions raised by ``creator`` are not cached.
+        """
+        value = self.get(key, _marker)
+        if value is _marker:
+            value = self.set(key, creator())
+        return value
+
+    def invalidate(self, key=None):
+        """Remove entry with given ``key`` or all entries if no key is given."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate):
+        """Remove all entries whose key fulfills ``predicate``."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self._data),
+                    max_size=self.max_size, ttl=self.ttl)
+
+
+def cache_factory(registry, name, ttl=300, max_size=128):
+    """
+    Return the named cache of this worker. It is created on first use with
+    ``ttl`` and ``max_size`` unless they are overwritten in the settings.
+    """
+    caches = getattr(registry, 'caches', None)
+    if caches is None or name not in caches:
+        with _lock:
+            if getattr(registry, 'caches', None) is None:
+                registry.caches = {}
+            if name not in registry.caches:
+                settings = registry.settings or {}
+                prefix = 'phoenix.cache.{}.'.format(name)
+                registry.caches[name] = TTLCache(
+                    ttl=float(settings.get(prefix + 'ttl', ttl)),
+                    max_size=int(settings.get(prefix + 'max_size', max_size)))
+                LOGGER.debug("created cache %s", name)
+    return registry.caches[name]
+
+
+def cache_stats(registry):
+    """Returns hit/miss counters of all caches of this worker."""
+    caches = getattr(registry, 'caches', None) or {}
+    return dict((name, cache.stats()) for name, cache in caches.items())
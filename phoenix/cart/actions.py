@@ -17,13 +17,8 @@ class CartActions(object):
         mime_type = self.request.params.get('mimetype')
         if mime_type:
             mime_type = mime_type.split(',')
-        items = list()
-        for item in self.request.cart:
-            if limit and len(items) >= limit:
-                break
-            if not mime_type or item.mime_type in mime_type:
-                items.append(dict(title=item.filename, url=item.url))
-        return items
+        return [dict(title=item.filename, url=item.url)
+                for item in self.request.cart.items(limit=limit, mime_types=mime_type)]
 
     @view_config(renderer='json', name='add_to_cart.json')
     def add_to_cart(self):
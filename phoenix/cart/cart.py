@@ -1,4 +1,26 @@
+"""
+Cart of the current user.
+
+Items of logged-in users are stored one document per item in the ``cart``
+collection, so adding or removing an item only touches its own document.
+Membership checks use the set of url hashes of the cart, which is loaded
+once per request. Requests without a database or user keep the cart in
+the session.
+"""
+
+import hashlib
+from datetime import datetime
+
+ITEM_FIELDS = ('url', 'title', 'abstract', 'mime_type', 'dataset')
+
+
+def url_hash(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
 class CartItem(object):
+    __slots__ = ('url', '_title', '_abstract', 'mime_type', 'dataset')
+
     def __init__(self, url, title=None, abstract=None, mime_type=None, dataset=None):
         self.url = url
         self._title = title
@@ -32,27 +54,140 @@ class CartItem(object):
                     mime_type=self.mime_type, dataset=self.dataset)
 
 
+def _item(doc):
+    return CartItem(**dict((key, doc.get(key)) for key in ITEM_FIELDS))
+
+
+class MongodbCartStore(object):
+    """
+    Cart items of user ``userid`` in the ``cart`` collection.
+    """
+
+    def __init__(self, collection, userid):
+        self.collection = collection
+        self.userid = userid
+
+    def hashes(self):
+        return set(doc['url_hash'] for doc in self.collection.find(
+            {'userid': self.userid}, {'url_hash': 1, '_id': 0}))
+
+    def items(self, limit=0, mime_types=None):
+        search_filter = {'userid': self.userid}
+        if mime_types:
+            search_filter['mime_type'] = {'$in': list(mime_types)}
+        projection = dict((key, 1) for key in ITEM_FIELDS)
+        for doc in self.collection.find(search_filter, projection).sort('added', 1).limit(limit):
+            yield _item(doc)
+
+    def add(self, item):
+        self.collection.update_one(
+            {'userid': self.userid, 'url_hash': url_hash(item.url)},
+            {'$set': item.to_json(), '$setOnInsert': {'added': datetime.now()}},
+            upsert=True)
+
+    def add_many(self, items):
+        for item in items:
+            self.add(item)
+
+    def remove(self, url):
+        doc = self.collection.find_one_and_delete({'userid': self.userid, 'url_hash': url_hash(url)})
+        return _item(doc) if doc else None
+
+    def clear(self):
+        self.collection.delete_many({'userid': self.userid})
+
+
+class SessionCartStore(object):
+    """
+    Cart items in the session.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def _items(self):
+        return self.session.get('cart') or []
+
+    def _save(self, items):
+        self.session['cart'] = items
+        self.session.changed()
+
+    def hashes(self):
+        return set(url_hash(item['url']) for item in self._items())
+
+    def items(self, limit=0, mime_types=None):
+        count = 0
+        for item in self._items():
+            if limit and count >= limit:
+                break
+            if not mime_types or item.get('mime_type') in mime_types:
+                count += 1
+                yield _item(item)
+
+    def add(self, item):
+        items = [other for other in self._items() if other['url'] != item.url]
+        items.append(item.to_json())
+        self._save(items)
+
+    def remove(self, url):
+        removed = [item for item in self._items() if item['url'] == url]
+        if removed:
+            self._save([item for item in self._items() if item['url'] != url])
+            return _item(removed[0])
+        return None
+
+    def clear(self):
+        self._save([])
+
+
+def cart_store(request):
+    userid = request.authenticated_userid
+    db = getattr(request, 'db', None)
+    if db is None or not userid:
+        return SessionCartStore(request.session)
+    store = MongodbCartStore(db.cart, userid)
+    # move cart items of older sessions
+    if request.session.get('cart'):
+        store.add_many(SessionCartStore(request.session).items())
+        del request.session['cart']
+    return store
+
+
 class Cart(object):
 
-    def __init__(self, request):
+    def __init__(self, request, store=None):
         self.request = request
-        self.session = request.session
-        # TODO: loading stored items needs to be improved
-        self.items = None
-        self.load()
+        self.store = store or cart_store(request)
+        self._hashes = None
+
+    @property
+    def hashes(self):
+        """
+        Set of url hashes of all cart items. Loaded on first use.
+        """
+        if self._hashes is None:
+            self._hashes = self.store.hashes()
+        return self._hashes
 
     def __iter__(self):
         """
         Allow the cart to be iterated giving access to the cart's items.
         """
-        for key in self.items:
-            yield self.items[key]
+        return self.store.items()
 
     def __contains__(self, url):
         """
         Returns: True if cart item with given url is in cart, otherwise False.
         """
-        return url in self.items
+        if not url:
+            return False
+        return url_hash(url) in self.hashes
+
+    def items(self, limit=0, mime_types=None):
+        """
+        Returns: at most ``limit`` cart items with one of the given ``mime_types``.
+        """
+        return self.store.items(limit=limit, mime_types=mime_types)
 
     def add_item(self, url, title=None, abstract=None, mime_type=None):
         """
@@ -60,8 +195,9 @@ class Cart(object):
         """
         if url and self.request.has_permission('edit'):
             item = CartItem(url, title=title, abstract=abstract, mime_type=mime_type)
-            self.items[url] = item
-            self.save()
+            self.store.add(item)
+            if self._hashes is not None:
+                self._hashes.add(url_hash(url))
         else:
             item = None
         return item
@@ -70,19 +206,19 @@ class Cart(object):
         """
         Remove cart item with given url.
         """
-        if url and url in self.items:
-            item = self.items[url]
-            del self.items[url]
-            self.save()
+        if url:
+            item = self.store.remove(url)
+            if self._hashes is not None:
+                self._hashes.discard(url_hash(url))
         else:
             item = None
         return item
 
     def count(self):
         """
-        Returns: number of cart items.
+        Returns: number of cart items. Uses the url hashes loaded for this request.
         """
-        return len(self.items)
+        return len(self.hashes)
 
     def has_items(self):
         """
@@ -92,31 +228,13 @@ class Cart(object):
 
     def clear(self):
         """
-        Removes all items of cart and updates session.
-        """
-        self.items = {}
-        self.session['cart'] = []
-        self.session.changed()
-
-    def save(self):
-        """
-        Store cart items in session.
-        """
-        self.session['cart'] = self.to_json()
-        self.session.changed()
-
-    def load(self):
-        """
-        Load cart items from session.
+        Removes all items of cart.
         """
-        items_as_json = self.session.get('cart')
-        self.items = {}
-        if items_as_json:
-            for item in items_as_json:
-                self.items[item['url']] = CartItem(**item)
+        self.store.clear()
+        self._hashes = set()
 
     def to_json(self):
         """
         Returns: json representation of all cart items.
         """
-        return [self.items[key].to_json() for key in self.items]
+        return [item.to_json() for item in self]
@@ -1,4 +1,5 @@
 from mako.template import Template
+import time
 import uuid
 from os.path import join, dirname
 from collections import namedtuple
@@ -8,10 +9,10 @@ from owslib.wps import WebProcessingService
 
 
 from pyramid.settings import asbool
-from pyramid.events import NewRequest
 
 from phoenix.db import mongodb
-from phoenix.twitcherclient import twitcher_service_factory
+from phoenix.events import CatalogChanged
+from phoenix.twitcherclient import CachedTwitcherService
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
@@ -19,24 +20,24 @@ LOGGER = logging.getLogger("PHOENIX")
 
 def includeme(config):
 
-    # catalog service
-    def add_catalog(event):
-        settings = event.request.registry.settings
+    # catalog service, only created when a request uses it
+    def add_catalog(request):
+        settings = request.registry.settings
         if settings.get('catalog') is None:
             try:
-                settings['catalog'] = catalog_factory(config.registry)
+                settings['catalog'] = catalog_factory(request.registry)
             except Exception:
                 LOGGER.exception('Could not connect catalog service.')
-        else:
-            LOGGER.debug("catalog already initialized")
-        event.request.catalog = settings.get('catalog')
-    config.add_subscriber(add_catalog, NewRequest)
+        return settings.get('catalog')
+    config.add_request_method(add_catalog, 'catalog', reify=True)
 
 
 def catalog_factory(registry):
-    service_registry = twitcher_service_factory(registry)
+    service_registry = CachedTwitcherService(registry)
     db = mongodb(registry)
-    catalog = MongodbCatalog(db.catalog, service_registry)
+    catalog = MongodbCatalog(
+        db.catalog, service_registry, registry=registry,
+        poll_interval=float(registry.settings.get('phoenix.catalog.poll_interval', '5')))
     return catalog
 
 
@@ -97,8 +98,19 @@ class Catalog(object):
     def harvest(self, url, service_type, service_name=None, service_title=None, public=False, c4i=False):
         raise NotImplementedError
 
+    def service_names(self):
+        """Returns the index url -> service name of the twitcher registry."""
+        try:
+            return self.service_registry.url_index()
+        except Exception:
+            LOGGER.exception("could not list services.")
+            return {}
+
     def get_service_name(self, record):
         """Get service name from twitcher registry for given service (url)."""
+        name = self.service_names().get(record.source)
+        if name:
+            return name
         service = self.service_registry.get_service_by_url(record.source)
         if not service:
             raise Exception("Could not find service with url=%s", record.source)
@@ -130,21 +142,76 @@ def doc2record(document):
     return record
 
 
+class CatalogSnapshot(object):
+    """Immutable copy of the service records of catalog ``version``."""
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = tuple(records)
+
+    def services(self, service_type=None):
+        return [record for record in self.records
+                if record.type == 'service' and (not service_type or record.format == service_type)]
+
+
 class MongodbCatalog(Catalog):
-    """Implementation of a Catalog with MongoDB."""
+    """
+    Implementation of a Catalog with MongoDB.
+
+    Service records are read from an in-process snapshot. Every change bumps
+    the version stamp in the ``catalog_version`` collection, which is checked
+    at most every ``poll_interval`` seconds, so all processes pick up changes.
+    """
 
-    def __init__(self, collection, service_registry):
+    def __init__(self, collection, service_registry, registry=None, poll_interval=5, timer=time.time):
         self.collection = collection
+        self.versions = collection.database.catalog_version
         self.service_registry = service_registry
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.timer = timer
+        self._snapshot = None
+        self._checked = 0
+
+    def version(self):
+        doc = self.versions.find_one({'_id': 'catalog'})
+        return doc.get('version', 0) if doc else 0
+
+    def snapshot(self):
+        """Returns the current snapshot of the catalog records."""
+        snapshot = self._snapshot
+        now = self.timer()
+        if snapshot is None or now - self._checked > self.poll_interval:
+            version = self.version()
+            self._checked = now
+            if snapshot is None or snapshot.version != version:
+                if snapshot is not None and self.registry is not None:
+                    # changed by another process
+                    self.registry.notify(CatalogChanged(self.registry))
+                snapshot = CatalogSnapshot(
+                    version, [doc2record(doc) for doc in self.collection.find({'type': 'service'})])
+                self._snapshot = snapshot
+                LOGGER.debug("loaded catalog version %s", version)
+        return snapshot
+
+    def _changed(self, service_name=None):
+        """Bump the catalog version and notify subscribers (caches) about changes of the service registry."""
+        self.versions.update_one({'_id': 'catalog'}, {'$inc': {'version': 1}}, upsert=True)
+        self._snapshot = None
+        if self.registry is not None:
+            self.registry.notify(CatalogChanged(self.registry, service_name))
 
     def get_record_by_id(self, identifier):
         return doc2record(self.collection.find_one({'identifier': identifier}))
 
     def delete_record(self, identifier):
         record = self.get_record_by_id(identifier)
+        service_name = None
         if record.format == WPS_TYPE:
-            self.service_registry.unregister_service(self.get_service_name(record))
+            service_name = self.get_service_name(record)
+            self.service_registry.unregister_service(service_name)
         self.collection.delete_one({'identifier': identifier})
+        self._changed(service_name)
 
     def insert_record(self, record):
         record['identifier'] = uuid.uuid4().hex
@@ -153,6 +220,7 @@ class MongodbCatalog(Catalog):
     def harvest(self, url, service_type, service_name=None, service_title=None, public=False, c4i=False):
         if service_type == THREDDS_TYPE:
             self.insert_record(_fetch_thredds_metadata(url, title=service_title))
+            self._changed()
         elif service_type == WPS_TYPE:
             # register service first
             service = self.service_registry.register_service(
@@ -170,15 +238,15 @@ class MongodbCatalog(Catalog):
                 LOGGER.exception("could not harvest metadata")
                 self.service_registry.unregister_service(name=service_name)
                 raise Exception("could not harvest metadata")
+            finally:
+                self._changed(service.get('name'))
         else:
             raise NotImplementedError
 
     def get_services(self, service_type=None, maxrecords=100):
-        search_filter = {'type': 'service'}
-        if service_type:
-            search_filter['format'] = service_type
-        return [doc2record(doc) for doc in self.collection.find(search_filter)]
+        return self.snapshot().services(service_type)
 
     def clear_services(self):
         self.service_registry.clear_services()
         self.collection.drop()
+        self._changed()
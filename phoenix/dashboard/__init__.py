@@ -1,3 +1,5 @@
+from phoenix.dashboard.stats import load_stats
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -6,4 +8,8 @@ def includeme(config):
     # settings = config.registry.settings
     logger.debug('Adding dashboard ...')
 
+    def get_dashboard_stats(request):
+        return load_stats(request.db)
+    config.add_request_method(get_dashboard_stats, 'dashboard_stats', reify=True)
+
     config.add_route('dashboard', '/dashboard/{tab}')
@@ -0,0 +1,176 @@
+"""
+Materialized statistics of the dashboard.
+
+The counters are kept in a single document of the ``stats`` collection.
+They are updated by job and user events and recomputed when the dashboard
+loads a document older than ``RECONCILE_MINUTES`` (or by the optional
+``reconcile_stats`` celery beat task). Logins are counted in hourly buckets of
+user ids for the last week, older buckets are removed on the next login.
+"""
+
+from datetime import datetime, timedelta
+
+from pyramid.events import subscriber
+
+from phoenix.db import mongodb
+from phoenix.events import JobStarted, JobFinished
+from phoenix.security import Guest
+from phoenix.wps import RUNNING
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+STATS_ID = 'dashboard'
+BUCKET_FORMAT = '%Y%m%d%H'
+LOGIN_DAYS = 7
+RECONCILE_MINUTES = 30
+
+
+def _update(db, update):
+    db.stats.update_one({'_id': STATS_ID}, update, upsert=True)
+
+
+def job_started(db):
+    _update(db, {'$inc': {'jobs.total': 1, 'jobs.running': 1}})
+
+
+def job_finished(db, job):
+    """
+    Counts the finished ``job`` once. Jobs which were deleted while running
+    are already subtracted by ``jobs_removed`` and are not counted.
+    """
+    counted = db.jobs.find_one_and_update(
+        {'identifier': job['identifier'], 'stats_counted': {'$ne': True}},
+        {'$set': {'stats_counted': True}},
+        projection={'_id': 1})
+    if counted is None:
+        return False
+    inc = {'jobs.running': -1}
+    if job.get('status') == 'ProcessSucceeded':
+        inc['jobs.succeeded'] = 1
+    else:
+        inc['jobs.failed'] = 1
+    _update(db, {'$inc': inc})
+    return True
+
+
+def _job_counts(db, search_filter=None):
+    pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+    if search_filter:
+        pipeline.insert(0, {'$match': search_filter})
+    counts = dict((group['_id'], group['count']) for group in db.jobs.aggregate(pipeline))
+    return dict(total=sum(counts.values()),
+                running=sum(counts.get(status, 0) for status in RUNNING),
+                succeeded=counts.get('ProcessSucceeded', 0),
+                failed=counts.get('ProcessFailed', 0))
+
+
+def jobs_removed(db, identifiers):
+    """Call before the jobs with given ``identifiers`` are deleted."""
+    counts = _job_counts(db, {'identifier': {'$in': list(identifiers)}})
+    _update(db, {'$inc': dict(('jobs.' + key, -value) for key, value in counts.items() if value)})
+
+
+def _users_inc(group, value):
+    inc = {'users.total': value}
+    if group == Guest:
+        inc['users.not_activated'] = value
+    return inc
+
+
+def user_added(db, group=Guest):
+    _update(db, {'$inc': _users_inc(group, 1)})
+
+
+def user_removed(db, group):
+    _update(db, {'$inc': _users_inc(group, -1)})
+
+
+def user_group_changed(db, old_group, new_group):
+    """Users of the ``Guest`` group are counted as not activated."""
+    if (old_group == Guest) != (new_group == Guest):
+        _update(db, {'$inc': {'users.not_activated': 1 if new_group == Guest else -1}})
+
+
+def expired_buckets(logins, now):
+    """Returns the login buckets older than ``LOGIN_DAYS``."""
+    first = (now - timedelta(days=LOGIN_DAYS)).strftime(BUCKET_FORMAT)
+    return [bucket for bucket in logins or {} if bucket < first]
+
+
+def user_logged_in(db, userid, now=None):
+    now = now or datetime.now()
+    stats = db.stats.find_one_and_update(
+        {'_id': STATS_ID}, {'$addToSet': {'logins.' + now.strftime(BUCKET_FORMAT): userid}},
+        projection={'logins': 1}, upsert=True)
+    # old buckets are removed without waiting for reconcile_stats
+    expired = expired_buckets((stats or {}).get('logins'), now)
+    if expired:
+        _update(db, {'$unset': dict(('logins.' + bucket, '') for bucket in expired)})
+
+
+def reconcile_stats(db, now=None):
+    """
+    Recomputes all counters from the jobs and users collections.
+    """
+    now = now or datetime.now()
+    logins = {}
+    since = now - timedelta(days=LOGIN_DAYS)
+    for user in db.users.find({'last_login': {'$gt': since}}, {'identifier': 1, 'last_login': 1}):
+        logins.setdefault(user['last_login'].strftime(BUCKET_FORMAT), []).append(user['identifier'])
+    stats = dict(
+        jobs=_job_counts(db),
+        users=dict(total=db.users.count(),
+                   not_activated=db.users.find({'group': Guest}).count()),
+        logins=logins,
+        reconciled=now)
+    db.stats.replace_one({'_id': STATS_ID}, stats, upsert=True)
+    return stats
+
+
+def load_stats(db, now=None):
+    """
+    Returns the statistics document. It is computed on first use and
+    recomputed when it is older than ``RECONCILE_MINUTES``. Only the request
+    which claims the recompute runs it, others use the current document.
+    """
+    now = now or datetime.now()
+    stats = db.stats.find_one({'_id': STATS_ID})
+    if not stats:
+        return reconcile_stats(db, now=now)
+    reconciled = stats.get('reconciled')
+    if reconciled is None or reconciled < now - timedelta(minutes=RECONCILE_MINUTES):
+        claimed = db.stats.find_one_and_update(
+            {'_id': STATS_ID, 'reconciled': reconciled}, {'$set': {'reconciled': now}},
+            projection={'_id': 1})
+        if claimed is not None:
+            stats = reconcile_stats(db, now=now)
+    return stats
+
+
+def logged_in(stats, since):
+    """Returns the number of users logged in after ``since`` (hourly resolution)."""
+    first = since.strftime(BUCKET_FORMAT)
+    userids = set()
+    for bucket, users in (stats.get('logins') or {}).items():
+        if bucket >= first:
+            userids.update(users)
+    return len(userids)
+
+
+@subscriber(JobStarted)
+def count_job_started(event):
+    try:
+        job_started(event.request.db)
+    except Exception:
+        LOGGER.exception("could not update stats.")
+
+
+@subscriber(JobFinished)
+def count_job_finished(event):
+    if event.registry is None:
+        return
+    try:
+        job_finished(mongodb(event.registry), event.job)
+    except Exception:
+        LOGGER.exception("could not update stats.")
@@ -2,11 +2,94 @@
 # http://docs.pylonsproject.org/projects/pyramid-cookbook/en/latest/database/mongodb.html
 # maybe use event to register mongodb
 
+import argparse
+from datetime import datetime
+
 import pymongo
+from bson.son import SON
+from pymongo import ASCENDING, DESCENDING
 
 import logging
 LOGGER = logging.getLogger(__name__)
 
+# indexes used by phoenix: collection -> list of (keys, options)
+INDEXES = {
+    'jobs': [
+        ([('identifier', ASCENDING)], {}),
+        ([('created', DESCENDING)], {}),
+        ([('userid', ASCENDING), ('created', DESCENDING)], {}),
+        ([('userid', ASCENDING), ('status', ASCENDING), ('created', DESCENDING)], {}),
+        ([('userid', ASCENDING), ('finished', DESCENDING)], {}),
+        ([('userid', ASCENDING), ('status', ASCENDING), ('finished', DESCENDING)], {}),
+        ([('userid', ASCENDING), ('title', ASCENDING)], {}),
+        ([('title', ASCENDING)], {}),
+        ([('tags', ASCENDING), ('created', DESCENDING)], {}),
+        ([('status', ASCENDING), ('poll_at', ASCENDING)], {}),
+        ([('finished', DESCENDING)], {}),
+    ],
+    'job_xml': [
+        ([('identifier', ASCENDING)], {'unique': True}),
+    ],
+    'users': [
+        ([('identifier', ASCENDING)], {}),
+        ([('login_id', ASCENDING)], {}),
+        ([('group', ASCENDING)], {}),
+        ([('last_login', DESCENDING)], {}),
+    ],
+    'esgf_cache': [
+        ([('expires', ASCENDING)], {'expireAfterSeconds': 0}),
+    ],
+    'cart': [
+        ([('userid', ASCENDING), ('url_hash', ASCENDING)], {'unique': True}),
+        ([('userid', ASCENDING), ('added', ASCENDING)], {}),
+    ],
+    'catalog': [
+        ([('identifier', ASCENDING)], {}),
+        ([('source', ASCENDING)], {}),
+        ([('type', ASCENDING), ('format', ASCENDING)], {}),
+    ],
+}
+
+
+def main_queries():
+    """
+    Returns the main queries of the monitor, the dashboard and the status poller
+    as name -> (collection, explain command).
+    """
+    from phoenix.monitor.queries import jobs_filter, counts_pipeline, JOB_PROJECTION
+    from phoenix.wps import RUNNING
+
+    def find(name, search_filter, sort=None):
+        command = {'find': name, 'filter': search_filter}
+        if sort:
+            command['sort'] = SON(sort)
+        return name, command
+
+    def monitor(search_filter, status=None, sort='created'):
+        name, command = find('jobs', jobs_filter(search_filter, status),
+                             [(sort, ASCENDING if sort == 'title' else DESCENDING)])
+        command['projection'] = JOB_PROJECTION
+        return name, command
+
+    since = datetime(1970, 1, 1)
+    return {
+        'monitor_jobs': monitor({'userid': ''}),
+        'monitor_jobs_finished': monitor({'userid': ''}, status='Finished', sort='finished'),
+        'monitor_jobs_by_process': monitor({'userid': ''}, sort='title'),
+        'monitor_public_jobs': monitor({'tags': 'public'}),
+        'monitor_all_jobs': monitor({}),
+        'monitor_all_jobs_by_process': monitor({}, sort='title'),
+        'monitor_counts': ('jobs', {'aggregate': 'jobs', 'pipeline': counts_pipeline({'userid': ''}), 'cursor': {}}),
+        'poller_due_jobs': find('jobs', {'status': {'$in': RUNNING}, 'poll_at': {'$lte': since}},
+                                [('poll_at', ASCENDING)]),
+        'job': find('jobs', {'identifier': ''}),
+        'user': find('users', {'identifier': ''}),
+        'login': find('users', {'login_id': ''}),
+        'users_logged_in': find('users', {'last_login': {'$gt': since}}),
+        'services': find('catalog', {'type': 'service', 'format': 'WPS'}),
+        'cart': find('cart', {'userid': ''}, [('added', ASCENDING)]),
+    }
+
 
 def mongodb(registry):
     settings = registry.settings
@@ -14,6 +97,74 @@ def mongodb(registry):
     return db
 
 
+def missing_indexes(db):
+    """
+    Returns the declared indexes which do not exist as list of (collection name, keys, options).
+    """
+    missing = []
+    for name, indexes in sorted(INDEXES.items()):
+        existing = [[tuple(key) for key in info['key']] for info in db[name].index_information().values()]
+        for keys, options in indexes:
+            if keys not in existing:
+                missing.append((name, keys, options))
+    return missing
+
+
+def ensure_indexes(db):
+    """
+    Creates the missing indexes and returns their names.
+    """
+    created = []
+    for name, keys, options in missing_indexes(db):
+        LOGGER.info("creating index %s on %s ...", keys, name)
+        created.append(db[name].create_index(keys, background=True, **options))
+    return created
+
+
+def verify_indexes(db):
+    """
+    Warns about missing indexes and returns them.
+    """
+    missing = missing_indexes(db)
+    for name, keys, _ in missing:
+        LOGGER.warning("missing index %s on collection %s. Run phoenix-db-indexes to create it.", keys, name)
+    return missing
+
+
+def plan_stages(plan):
+    """Returns the stage names of a query plan starting with the outermost stage."""
+    stages = []
+    while plan:
+        stages.append(plan.get('stage'))
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return stages
+
+
+def winning_plan(explained):
+    """Returns the winning plan of an explained find or aggregate command."""
+    if 'queryPlanner' not in explained:
+        # aggregation: the plan of the first ($cursor) stage
+        for stage in explained.get('stages', []):
+            if '$cursor' in stage:
+                explained = stage['$cursor']
+                break
+    return explained.get('queryPlanner', {}).get('winningPlan', {})
+
+
+def query_plans(db):
+    """
+    Returns the stages of the winning query plan for each of the main queries.
+    A ``COLLSCAN`` stage means the query does not use an index.
+    """
+    plans = {}
+    for query, (name, command) in sorted(main_queries().items()):
+        result = db.command('explain', command, verbosity='queryPlanner')
+        plans[query] = plan_stages(winning_plan(result))
+        if 'COLLSCAN' in plans[query]:
+            LOGGER.warning("query %s on %s scans the whole collection.", query, name)
+    return plans
+
+
 def includeme(config):
     settings = config.get_settings()
     config.registry.dbclient = pymongo.MongoClient(
@@ -21,6 +172,37 @@ def includeme(config):
         int(settings['mongodb.port']))
     LOGGER.debug("MongoDB enabled.")
 
+    # missing indexes are only reported, they are created by phoenix-db-indexes
+    try:
+        verify_indexes(mongodb(config.registry))
+    except Exception:
+        LOGGER.exception("could not check indexes.")
+
     def add_db(event):
         return mongodb(event.registry)
     config.add_request_method(add_db, 'db', reify=True)
+
+
+def main(argv=None):
+    from pyramid.paster import bootstrap, setup_logging
+
+    parser = argparse.ArgumentParser(description="Create and verify the indexes of the Phoenix database.")
+    parser.add_argument('config_uri', help="Phoenix configuration file, e.g. phoenix.ini")
+    parser.add_argument('--create', action='store_true', help="create missing indexes")
+    parser.add_argument('--explain', action='store_true', help="show the query plans of the main queries")
+    args = parser.parse_args(argv)
+
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+    try:
+        db = mongodb(env['registry'])
+        if args.create:
+            for name in ensure_indexes(db):
+                print("Created index {}.".format(name))
+        for name, keys, _ in missing_indexes(db):
+            print("Missing index {} on {}.".format(keys, name))
+        if args.explain:
+            for query, stages in sorted(query_plans(db).items()):
+                print("{}: {}".format(query, ' <- '.join(stages)))
+    finally:
+        env['closer']()
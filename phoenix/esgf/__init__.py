@@ -24,6 +24,11 @@ def includeme(config):
                     route_name='esgfsearch',
                     attr='search_datasets',
                     renderer='phoenix:esgf/templates/esgf/esgfsearch.pt')
+    config.add_route('esgfsearch_datasets', '/esgfsearch/datasets.json')
+    config.add_view('phoenix.esgf.views.ESGFSearchActions',
+                    route_name='esgfsearch_datasets',
+                    attr='search_datasets_json',
+                    renderer='json')
     config.add_route('esgfsearch_items', '/esgfsearch/items')
     config.add_view('phoenix.esgf.views.ESGFSearchActions',
                     route_name='esgfsearch_items',
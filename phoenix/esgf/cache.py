@@ -0,0 +1,128 @@
+"""
+Cache of ESGF search results shared by all workers.
+
+Results are stored in the ``esgf_cache`` collection, keyed by a hash of the
+normalized query parameters. Entries expire after ``esgfsearch.cache.ttl``
+seconds (default: 600, 0 disables the cache) and are removed by the TTL
+index on ``expires``. When there are more than ``esgfsearch.cache.max_size``
+entries (default: 1000) the oldest are removed; the size is checked on a
+sample of the writes. Hit and miss counters in the ``stats`` collection are
+sampled as well, so a cache hit is a single read.
+"""
+
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+STATS_ID = 'esgf_cache'
+# one in STATS_SAMPLE lookups updates the hit/miss counters
+STATS_SAMPLE = 10
+# one in EVICT_SAMPLE writes checks the size of the cache
+EVICT_SAMPLE = 20
+
+
+def search_key(kind, constraints=None, **params):
+    """
+    Returns the cache key of an ESGF search.
+
+    Constraints are given as (key, value) pairs and are sorted, so the same
+    query gives the same key regardless of the order of the constraints.
+    """
+    canonical = dict((key, value) for key, value in params.items() if value is not None)
+    canonical['kind'] = kind
+    canonical['constraints'] = sorted(set((str(key), str(value)) for key, value in constraints or []))
+    if isinstance(canonical.get('query'), str):
+        canonical['query'] = canonical['query'].strip()
+    text = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class SearchCache(object):
+    def __init__(self, collection, stats, ttl=600, max_size=1000,
+                 stats_sample=STATS_SAMPLE, evict_sample=EVICT_SAMPLE):
+        self.collection = collection
+        self.stats_collection = stats
+        self.ttl = ttl if collection is not None else 0
+        self.max_size = max_size
+        self.stats_sample = stats_sample
+        self.evict_sample = evict_sample
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _sampled(self, rate):
+        return random.random() * rate < 1
+
+    def _count(self, counter):
+        if self._sampled(self.stats_sample):
+            self.stats_collection.update_one(
+                {'_id': STATS_ID}, {'$inc': {counter: max(self.stats_sample, 1)}}, upsert=True)
+
+    def get(self, key):
+        """Returns the cached value of ``key`` or None."""
+        doc = self.collection.find_one({'_id': key, 'expires': {'$gt': datetime.now()}}, {'value': 1})
+        self._count('hits' if doc else 'misses')
+        if doc:
+            return json.loads(doc['value'])
+        return None
+
+    def set(self, key, value):
+        self.collection.replace_one(
+            {'_id': key},
+            {'value': json.dumps(value), 'expires': datetime.now() + timedelta(seconds=self.ttl)},
+            upsert=True)
+        if self._sampled(self.evict_sample):
+            self.evict()
+        return value
+
+    def get_or_search(self, key, search):
+        """
+        Returns the cached result of ``key`` or runs ``search`` and caches its result.
+        """
+        if not self.enabled:
+            return search()
+        try:
+            value = self.get(key)
+        except Exception:
+            LOGGER.exception("could not read esgf cache.")
+            return search()
+        if value is None:
+            value = search()
+            try:
+                self.set(key, value)
+            except Exception:
+                LOGGER.exception("could not update esgf cache.")
+        return value
+
+    def evict(self):
+        """Removes the oldest entries above ``max_size``."""
+        count = self.collection.count()
+        if count > self.max_size:
+            oldest = self.collection.find({}, {'_id': 1}).sort('expires', 1).limit(count - self.max_size)
+            self.collection.delete_many({'_id': {'$in': [doc['_id'] for doc in oldest]}})
+
+    def stats(self):
+        if self.collection is None:
+            return dict(hits=0, misses=0, size=0, max_size=self.max_size, ttl=self.ttl)
+        doc = self.stats_collection.find_one({'_id': STATS_ID}) or {}
+        return dict(hits=doc.get('hits', 0), misses=doc.get('misses', 0),
+                    size=self.collection.count(), max_size=self.max_size, ttl=self.ttl)
+
+
+def esgf_cache(request):
+    """
+    Returns the search cache of the database of ``request``. Without a
+    database or with ``esgfsearch.cache.ttl = 0`` nothing is cached.
+    """
+    settings = request.registry.settings or {}
+    ttl = int(settings.get('esgfsearch.cache.ttl', '600'))
+    db = getattr(request, 'db', None)
+    if db is None or ttl <= 0:
+        return SearchCache(None, None, ttl=0)
+    return SearchCache(db.esgf_cache, db.stats, ttl=ttl,
+                       max_size=int(settings.get('esgfsearch.cache.max_size', '1000')))
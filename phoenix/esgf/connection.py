@@ -0,0 +1,56 @@
+"""
+Pool of ESGF search connections.
+
+Connections are kept per worker at the pyramid registry, keyed by index url
+and ``distrib``. Each connection uses its own persistent HTTP session, so
+the TCP and TLS connections to the index node are kept alive between
+searches. Timeouts are configured with ``esgfsearch.connect_timeout``
+(default: 10 secs) and ``esgfsearch.read_timeout`` (default: 60 secs). The
+read timeout is at most ``esgfsearch.timeout`` (default: 20 secs), so a
+search which is given up by the view does not keep its thread much longer.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pyesgf.search import SearchConnection
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+_lock = threading.Lock()
+
+# number of kept-alive connections per index node
+POOL_SIZE = 10
+
+
+def create_session(pool_size=POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def search_connection(registry, url, distrib=False):
+    """
+    Returns the pooled search connection to ``url``. It is shared by the
+    threads of this worker.
+    """
+    key = (url, bool(distrib))
+    connections = getattr(registry, 'esgf_connections', None)
+    if connections is None or key not in connections:
+        with _lock:
+            if getattr(registry, 'esgf_connections', None) is None:
+                registry.esgf_connections = {}
+            if key not in registry.esgf_connections:
+                settings = registry.settings or {}
+                timeout = (float(settings.get('esgfsearch.connect_timeout', '10')),
+                           min(float(settings.get('esgfsearch.read_timeout', '60')),
+                               float(settings.get('esgfsearch.timeout', '20'))))
+                LOGGER.debug("new search connection to %s (distrib=%s)", url, distrib)
+                registry.esgf_connections[key] = SearchConnection(
+                    url, distrib=bool(distrib), timeout=timeout, session=create_session())
+    return registry.esgf_connections[key]
@@ -1,4 +1,5 @@
 import datetime
+import re
 from dateutil import parser as date_parser
 from collections import Counter
 
@@ -6,82 +7,99 @@ from webhelpers2.number import format_byte_size
 
 from pyramid.settings import asbool
 
-from pyesgf.search import SearchConnection
 from pyesgf.search.consts import TYPE_DATASET, TYPE_AGGREGATION, TYPE_FILE
+from pyesgf.search.results import DatasetResult
 from pyesgf.multidict import MultiDict
 
+from phoenix.esgf.cache import esgf_cache, search_key
+from phoenix.esgf.connection import search_connection
+from phoenix.utils import executor
+
 import logging
 LOGGER = logging.getLogger("PHOENIX")
 
 
+# date part of filename: <name>_<start>-<end>.nc
+FILENAME_DATE = re.compile(r'_(\d{4})[^_.-]*-(\d{4})[^_.-]*\.[^.]*$')
+VARIABLE_TYPES = ('variable', 'cf_standard_name', 'variable_long_name')
+# number of datasets on a result page
+PAGE_SIZE = 5
+# largest page a client can request with the ``limit`` parameter
+MAX_PAGE_SIZE = 100
+
+
 def date_from_filename(filename):
     """Example cordex:
     tas_EUR-44i_ECMWF-ERAINT_evaluation_r1i1p1_HMS-ALADIN52_v1_mon_200101-200812.nc
+
+    Returns None for fixed fields (fx) and filenames without date.
+    """
+    match = FILENAME_DATE.search(filename)
+    if match is None:
+        return None
+    return (int(match.group(1)), int(match.group(2)))
+
+
+class ResultFilter(object):
+    """
+    Filter of search results by variable constraints and time range.
+
+    It is built once per query and keeps the allowed values of each
+    variable type as sets.
     """
-    LOGGER.debug('filename=%s', filename)
-    result = None
-    value = filename.split('.')
-    value.pop()  # remove .nc
-    value = value[-1]  # part with date
-    value = value.split('_')[-1]  # only date part
-    LOGGER.debug('date part = %s', value)
-    if value != 'fx':
-        value = value.split('-')  # split start-end
-        start_year = int(value[0][:4])  # keep only the year
-        end_year = int(value[1][:4])
-        result = (start_year, end_year)
-    return result
+
+    def __init__(self, constraints, start=None, end=None):
+        self.allowed = []
+        for var_type in VARIABLE_TYPES:
+            if var_type in constraints:
+                if hasattr(constraints, 'getall'):
+                    values = constraints.getall(var_type)
+                else:
+                    values = [constraints[var_type]]
+                self.allowed.append((var_type, frozenset(values)))
+        self.temporal = start is not None and end is not None
+        self.start = start
+        self.end = end
+
+    def match_variables(self, variables):
+        """return True if variables fulfill constraints"""
+        if not self.allowed:
+            return True
+        # at least one variable constraint must be fulfilled
+        for var_type, allowed_values in self.allowed:
+            values = variables.get(var_type)
+            if values and not allowed_values.isdisjoint(values):
+                return True
+        return False
+
+    def match_time(self, filename):
+        """return True if file is in timerange start/end"""
+        if not self.temporal:
+            return True
+        match = FILENAME_DATE.search(filename)
+        if match is None:  # fixed field
+            return True
+        return int(match.group(1)) <= self.end and int(match.group(2)) >= self.start
+
+    def apply(self, results, temporal=True):
+        """Yields the results which pass the filter."""
+        match_time = self.match_time if temporal and self.temporal else None
+        for result in results:
+            if match_time is not None and not match_time(result.filename):
+                continue
+            if self.allowed and not self.match_variables(result.json):
+                continue
+            yield result
 
 
 def variable_filter(constraints, variables):
     """return True if variable fulfills contraints"""
-    var_types = ['variable', 'cf_standard_name', 'variable_long_name']
-
-    success = True
-    # check different types of variables
-    for var_type in var_types:
-        # is there a constrain for this variable type?
-        if var_type in constraints:
-            # at least one variable constraint must be fulfilled
-            success = False
-            # do we have this variable type?
-            if var_type in variables:
-                # do we have an allowed value?
-                allowed_values = constraints.getall(var_type)
-                for var in variables[var_type]:
-                    if var in allowed_values:
-                        # if one variable matches then we are ok
-                        return True
-    return success
+    return ResultFilter(constraints).match_variables(variables)
 
 
 def temporal_filter(filename, start=None, end=None):
     """return True if file is in timerange start/end"""
-    # TODO: keep fixed fields fx ... see esgsearch.js
-    """
-    // fixed fields are always in time range
-    if ($.inArray("fx", doc.time_frequency) >= 0) {
-    return true;
-    }
-    """
-
-    LOGGER.debug('filename=%s, start_date=%s, end_date=%s', filename, start, end)
-
-    if start is None or end is None:
-        return True
-    start_end = date_from_filename(filename)
-    if start_end is None:  # fixed field
-        return True
-    start_year = start_end[0]
-    end_year = start_end[1]
-    if end and start_year > end:
-        LOGGER.debug('skip: %s > %s', start_year, end)
-        return False
-    if start and end_year < start:
-        LOGGER.debug('skip: %s < %s', end_year, start)
-        return False
-    LOGGER.debug("pass: %s", filename)
-    return True
+    return ResultFilter({}, start, end).match_time(filename)
 
 
 def query_params_from_appstruct(appstruct, defaults):
@@ -116,7 +134,8 @@ class ESGFSearch(object):
         if not url:
             settings = self.request.registry.settings
             url = settings.get('esgfsearch.url')
-        self.conn = SearchConnection(url, distrib=self.distrib)
+        self.url = url
+        self.conn = search_connection(self.request.registry, url, distrib=self.distrib)
 
     def _parse_params(self):
         """
@@ -124,7 +143,9 @@ class ESGFSearch(object):
         """
         self.query = self.request.params.get('query', '')
         self.selected = self.request.params.get('selected', 'project')
-        self.limit = int(self.request.params.get('limit', '0'))
+        self.facets = asbool(self.request.params.get('facets', 'true'))
+        self.offset = max(int(self.request.params.get('offset', '0')), 0)
+        self.limit = min(max(int(self.request.params.get('limit', str(PAGE_SIZE))), 0), MAX_PAGE_SIZE)
         self.distrib = asbool(self.request.params.get('distrib', 'false'))
         self.latest = self._latest = asbool(self.request.params.get('latest', 'true'))
         if self.latest is False:
@@ -181,31 +202,77 @@ class ESGFSearch(object):
             params['end'] = datetime.date(int(self.end), 12, 31)
         return params
 
+    def cache_key(self, kind, **params):
+        """
+        cache key of search with current search params.
+        """
+        return search_key(
+            kind,
+            constraints=self._constraints.items(),
+            url=self.url,
+            distrib=self.distrib,
+            latest=self.latest,
+            replica=self.replica,
+            query=self.query,
+            start=self._start,
+            end=self._end,
+            **params)
+
     def search_items(self):
         """
         search files and aggregations with download url and opendap url.
+
+        Both searches run concurrently. Results of a search which does not finish
+        within ``esgfsearch.timeout`` seconds (default: 20) are left out and the
+        result is marked as ``partial``.
         """
+        from concurrent.futures import wait
         dataset_id = self.request.params.get('dataset_id')
         LOGGER.debug('dataset_id = %s', dataset_id)
+        timeout = float(self.request.registry.settings.get('esgfsearch.timeout', '20'))
+        pool = executor('esgfsearch')
+        searches = [(search_type, pool.submit(self._run_search_items, dataset_id, search_type=search_type))
+                    for search_type in (TYPE_AGGREGATION, TYPE_FILE)]
+        wait([future for _, future in searches], timeout=timeout)
         items = []
-        items.extend(self._run_search_items(dataset_id, search_type=TYPE_AGGREGATION))
-        items.extend(self._run_search_items(dataset_id, search_type=TYPE_FILE))
-        return dict(items=items)
+        partial = False
+        for search_type, future in searches:
+            if not future.done():
+                # a running search can not be cancelled, it ends with the read timeout
+                if not future.cancel():
+                    LOGGER.warn("timeout while searching %s items of %s, search is still running",
+                                search_type, dataset_id)
+                else:
+                    LOGGER.warn("timeout while waiting to search %s items of %s", search_type, dataset_id)
+                partial = True
+            elif future.exception() is not None:
+                LOGGER.warn("could not search %s items of %s: %s", search_type, dataset_id, future.exception())
+                partial = True
+            else:
+                items.extend(future.result())
+        # depends on user and cart, not cached
+        for item in items:
+            if self.request.has_permission('edit'):
+                item['cart_available'] = item['opendap_url'] is not None
+            else:
+                item['cart_available'] = False
+            item['is_in_cart'] = item['opendap_url'] in self.request.cart
+        return dict(items=items, partial=partial)
 
     def _run_search_items(self, dataset_id, search_type):
         if not dataset_id:
             return []
+        key = self.cache_key('items', dataset_id=dataset_id, search_type=search_type)
+        return esgf_cache(self.request).get_or_search(
+            key, lambda: self._search_items(dataset_id, search_type))
+
+    def _search_items(self, dataset_id, search_type):
         ctx = self.conn.new_context(search_type=search_type, latest=self._latest, replica=self._replica)
         ctx = ctx.constrain(dataset_id=dataset_id)
         items = []
         LOGGER.debug("hit_count: %s", ctx.hit_count)
-        for result in ctx.search():
-            if search_type == TYPE_FILE and not temporal_filter(result.filename, self._start, self._end):
-                LOGGER.debug("skipped by temporal filter")
-                continue
-            if not variable_filter(self._constraints, variables=result.json):
-                LOGGER.debug("skipped by variable filter")
-                continue
+        result_filter = ResultFilter(self._constraints, self._start, self._end)
+        for result in result_filter.apply(ctx.search(), temporal=search_type == TYPE_FILE):
             # build abstract
             abstract = ''
             for field in ['variable', 'cf_standard_name', 'institute', 'experiment', 'domain', 'time_frequency']:
@@ -215,25 +282,37 @@ class ESGFSearch(object):
             if result.json.get('size'):
                 abstract += ' <span class="label label-info">{}</span>'.format(
                     format_byte_size(int(result.json.get('size', '0'))))
-            if self.request.has_permission('edit'):
-                cart_available = result.opendap_url is not None
-            else:
-                cart_available = False
             items.append(dict(
                 title=result.json.get('title', 'Unknown'),
                 abstract=abstract,
                 type=result.json.get('type'),
                 download_url=result.download_url,
                 opendap_url=result.opendap_url,
-                cart_available=cart_available,
-                is_in_cart=result.opendap_url in self.request.cart,
             ))
         return items
 
-    def search_datasets(self):
+    def search_datasets(self, facets=None, offset=None, limit=None):
         """
         search datasets according to search parameters.
+
+        With ``facets`` the facet counts are returned and ``limit`` datasets
+        starting at ``offset`` are returned as ``results``. ``limit=0`` only
+        returns the facet counts, ``facets=False`` only the result page.
         """
+        facets = self.facets if facets is None else facets
+        offset = self.offset if offset is None else offset
+        limit = self.limit if limit is None else limit
+        key = self.cache_key('datasets', selected=self.selected if facets else None,
+                             facets=facets, offset=offset, limit=limit)
+        result = esgf_cache(self.request).get_or_search(
+            key, lambda: self._search_datasets(facets, offset, limit))
+        # depends on user and cart, not cached
+        for item in result.get('results', []):
+            item['cart_available'] = self.request.has_permission('edit')
+            item['is_in_cart'] = item['catalog_url'] in self.request.cart
+        return result
+
+    def _dataset_context(self):
         ctx = self.conn.new_context(search_type=TYPE_DATASET, latest=self._latest, replica=self._replica)
         ctx = ctx.constrain(**self._constraints.mixed())
         if self.query:
@@ -242,28 +321,48 @@ class ESGFSearch(object):
             ctx = ctx.constrain(
                 from_timestamp="{}-01-01T12:00:00Z".format(self.start),
                 to_timestamp="{}-12-31T12:00:00Z".format(self.end))
-        results = ctx.search(batch_size=5, ignore_facet_check=False)
-        categories = sorted([tag for tag in ctx.facet_counts if len(ctx.facet_counts[tag]) > 1])
-        keywords = sorted(ctx.facet_counts[self.selected].keys())
+        return ctx
+
+    def _search_datasets(self, facets=True, offset=0, limit=PAGE_SIZE):
+        ctx = self._dataset_context()
+        result = dict(offset=offset, limit=limit)
+        if facets:
+            result.update(self._facet_counts(ctx))
+        if limit > 0:
+            result.update(self._result_page(ctx, offset, limit))
+        return result
+
+    def _facet_counts(self, ctx):
+        # one request with limit=0 and all facets
+        facet_counts = ctx.facet_counts
+        categories = sorted([tag for tag in facet_counts if len(facet_counts[tag]) > 1])
+        keywords = sorted(facet_counts.get(self.selected, {}).keys())
         pinned_keywords = []
-        for facet in ctx.facet_counts:
-            if facet not in self._constraints and len(ctx.facet_counts[facet]) == 1:
-                pinned_keywords.append("{}:{}".format(facet, list(ctx.facet_counts[facet].keys())[0]))
+        for facet in facet_counts:
+            if facet not in self._constraints and len(facet_counts[facet]) == 1:
+                pinned_keywords.append("{}:{}".format(facet, list(facet_counts[facet].keys())[0]))
         pinned_keywords = sorted(pinned_keywords)
-        projects = Counter(ctx.facet_counts['project']).most_common(7)
-        paged_results = []
-        for i in range(0, min(5, ctx.hit_count)):
-            paged_results.append(dict(
-                id=results[i].json['master_id'],
-                title=results[i].json['title'],
-                dataset_id=results[i].dataset_id,
-                number_of_files=results[i].number_of_files,
-                size=format_byte_size(results[i].json.get('size', '0')),
-                catalog_url=results[i].urls['THREDDS'][0][0]))
+        projects = Counter(facet_counts.get('project', {})).most_common(7)
         return dict(
             hit_count=ctx.hit_count,
             categories=','.join(categories),
             keywords=','.join(keywords),
             pinned_keywords=','.join(pinned_keywords),
-            projects=projects,
+            projects=projects)
+
+    def _result_page(self, ctx, offset, limit):
+        # one request for the page without facets
+        response = self.conn.send_search(ctx._build_query(), limit=limit, offset=offset)
+        paged_results = []
+        for doc in response['response']['docs']:
+            result = DatasetResult(doc, ctx)
+            paged_results.append(dict(
+                id=result.json['master_id'],
+                title=result.json['title'],
+                dataset_id=result.dataset_id,
+                number_of_files=result.number_of_files,
+                size=format_byte_size(result.json.get('size', '0')),
+                catalog_url=result.urls['THREDDS'][0][0]))
+        return dict(
+            hit_count=response['response']['numFound'],
             results=paged_results)
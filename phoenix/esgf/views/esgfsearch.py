@@ -15,10 +15,14 @@ class ESGFSearchActions(object):
     def search_datasets(self):
         result = dict()
         result.update(self.esgfsearch.query_params())
-        result.update(self.esgfsearch.search_datasets())
+        result['results'] = []
+        result.update(self.esgfsearch.search_datasets(facets=True))
         result['form'] = Form(ESGFSearchSchema())
         result['quickview'] = True
         return result
 
+    def search_datasets_json(self):
+        return self.esgfsearch.search_datasets()
+
     def search_items(self):
         return self.esgfsearch.search_items()
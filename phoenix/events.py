@@ -5,8 +5,9 @@ class JobStarted(object):
 
 
 class JobFinished(object):
-    def __init__(self, job):
+    def __init__(self, job, registry=None):
         self.job = job
+        self.registry = registry
 
     def succeeded(self):
         return self.job.get('status') == "ProcessSucceeded"
@@ -22,3 +23,17 @@ class SettingsChanged(object):
         for key, value in self.new_settings.items():
             converted[key.replace('_', '.')] = value
         return converted
+
+
+class CatalogChanged(object):
+    """Service registry was changed. ``service_name`` is None if all services are affected."""
+    def __init__(self, registry, service_name=None):
+        self.registry = registry
+        self.service_name = service_name
+
+
+class UserChanged(object):
+    """Profile or group of user ``userid`` was changed or the user was removed."""
+    def __init__(self, registry, userid):
+        self.registry = registry
+        self.userid = userid
@@ -25,6 +25,8 @@ class CustomGrid(Grid):
         self.request = request
         if 'url' not in kwargs:
             kwargs['url'] = request.current_route_url
+        # attributes with user ids, these users are fetched at once before rendering
+        self.user_attributes = []
         super(CustomGrid, self).__init__(*args, **kwargs)
         self.exclude_ordering = ['', 'preview', 'action', '_numbered', '_checkbox']
         if "_checkbox" in self.columns:
@@ -86,29 +88,25 @@ class CustomGrid(Grid):
         return _column_format
 
     def userid_td(self, attribute):
+        self.user_attributes.append(attribute)
+
         def _column_format(column_number, i, record):
-            # TODO: avoid database access ... maybe store additional info at job
-            userid = get_value(record, attribute)
-            label = 'Unknown'
-            if userid:
-                user = self.request.db.users.find_one(dict(identifier=userid))
-                if user:
-                    label = user.get('login_id')
+            label = self.request.user_labels.label(get_value(record, attribute), 'login_id')
             return HTML.td(label)
         return _column_format
 
     def user_td(self, attribute):
+        self.user_attributes.append(attribute)
+
         def _column_format(column_number, i, record):
-            # TODO: avoid database access ... maybe store additional info at job
-            userid = get_value(record, attribute)
-            label = 'Unknown'
-            if userid:
-                user = self.request.db.users.find_one(dict(identifier=userid))
-                if user:
-                    label = user.get('name')
+            label = self.request.user_labels.label(get_value(record, attribute), 'name')
             return HTML.td(label)
         return _column_format
 
+    def prefetch_users(self):
+        userids = [get_value(record, attribute) for record in self.itemlist for attribute in self.user_attributes]
+        self.request.user_labels.prefetch(userids)
+
     def render_title_td(self, title, abstract=None, keywords=[], data=[], format=None, source="#"):
         return self.render_td(renderer="title_td.mako", title=title, abstract=abstract,
                               keywords=keywords, data=data, format=format, source=source)
@@ -197,6 +195,8 @@ class CustomGrid(Grid):
         renders the styles correctly
         """
         records = []
+        if self.user_attributes:
+            self.prefetch_users()
         # first render headers record
         headers = self.make_headers()
         r = self.default_header_record_format(headers)
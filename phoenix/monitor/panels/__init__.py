@@ -1,6 +1,7 @@
 from pyramid_layout.panel import panel_config
 
 from phoenix.utils import time_ago_in_words
+from phoenix.xmlstore import job_response
 
 import logging
 logger = logging.getLogger(__name__)
@@ -46,4 +47,4 @@ def log(context, request):
 def xml(context, request):
     job_id = request.matchdict.get('job_id')
     job = request.db.jobs.find_one({'identifier': job_id})
-    return dict(xml=job.get('response'), job=job)
+    return dict(xml=job_response(request.db, job), job=job)
@@ -1,7 +1,8 @@
 from pyramid_layout.panel import panel_config
 
 from phoenix.wps import check_status
-from phoenix.monitor.utils import escape_output
+from phoenix.wps import job_data
+from phoenix.monitor.utils import output_details
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
@@ -14,9 +15,9 @@ def collect_inputs(status_location=None, response=None):
 
 def process_inputs(request, job_id):
     job = request.db.jobs.find_one({'identifier': job_id})
-    inputs = {}
+    inputs = []
     if job and job.get('status') == 'ProcessSucceeded':
-        inputs = collect_inputs(status_location=job.get('status_location'), response=job.get('response'))
+        inputs = job_data(request.db, job, 'inputs')
     return inputs
 
 
@@ -32,25 +33,10 @@ class Inputs(object):
 
         items = []
         for inp in process_inputs(self.request, job_id):
-            if inp.mimeType:
-                category = 'ComplexType'
-                data = inp.data
-            elif inp.dataType == 'BoundingBoxData':
-                category = 'BoundingBoxType'
-                data = ["{0.minx},{0.miny},{0.maxx},{0.maxy}".format(bbox) for bbox in inp.data]
-            elif inp.identifier == 'password':
-                data = "********"
-            else:
-                category = 'LiteralType'
-                data = inp.data
-
-            items.append(dict(title=inp.title,
-                              abstract=inp.abstract,
-                              identifier=inp.identifier,
-                              mime_type=inp.mimeType,
-                              data=escape_output(data),
-                              reference=escape_output(inp.reference),
-                              category=category))
+            item = output_details(self.request, inp)
+            if item['identifier'] == 'password':
+                item['data'] = ['********']
+            items.append(item)
 
         items = sorted(items, key=lambda item: item['identifier'], reverse=1)
         return dict(items=items)
@@ -1,6 +1,7 @@
 from pyramid_layout.panel import panel_config
 
 from phoenix.wps import check_status
+from phoenix.wps import job_data
 from phoenix.monitor.utils import output_details
 
 import logging
@@ -19,7 +20,7 @@ def process_outputs(request, job_id):
     job = request.db.jobs.find_one({'identifier': job_id})
     outputs = {}
     if job and job.get('status') == 'ProcessSucceeded':
-        outputs = collect_outputs(status_location=job.get('status_location'), response=job.get('response'))
+        outputs = dict((output['identifier'], output) for output in job_data(request.db, job, 'outputs'))
     return outputs
 
 
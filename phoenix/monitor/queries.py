@@ -0,0 +1,52 @@
+"""
+Queries of the job monitor, shared by the views and the index checks.
+"""
+
+from phoenix.wps import RUNNING, FINISHED
+from phoenix.xmlstore import XML_FIELDS
+
+
+# fields not needed to list jobs
+JOB_PROJECTION = dict((field, 0) for field in XML_FIELDS + ('log', 'inputs', 'outputs'))
+
+
+def status_filter(status):
+    if status == 'Running':
+        return {'$in': RUNNING}
+    elif status == 'Finished':
+        return {'$in': FINISHED}
+    return status
+
+
+def jobs_filter(search_filter, status=None):
+    """
+    Returns the query for the listed jobs with given ``status``.
+    """
+    if status:
+        return dict(search_filter, status=status_filter(status))
+    return search_filter
+
+
+def counts_pipeline(search_filter):
+    """
+    Returns the aggregation pipeline which counts the jobs for each status.
+    """
+    return [
+        {'$match': search_filter},
+        {'$group': {'_id': '$status', 'count': {'$sum': 1}}},
+    ]
+
+
+def count_jobs(counts, status=None):
+    """
+    Returns the number of jobs with given ``status`` from the counts by status.
+    """
+    if status == 'Running':
+        statuses = RUNNING
+    elif status == 'Finished':
+        statuses = FINISHED
+    elif status:
+        statuses = [status]
+    else:
+        statuses = list(counts)
+    return sum(counts.get(key, 0) for key in statuses)
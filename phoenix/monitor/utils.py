@@ -1,5 +1,7 @@
 from pyramid.compat import escape
 
+from phoenix.wps import data_as_dict
+
 import logging
 LOGGER = logging.getLogger("PHOENIX")
 
@@ -15,20 +17,22 @@ def escape_output(output):
 
 
 def output_details(request, output):
-    # get category and data
-    if output.mimeType:
+    """
+    Returns the template values of a stored job input or output.
+    """
+    if not isinstance(output, dict):
+        output = data_as_dict(output)
+    # get category
+    if output.get('mime_type'):
         category = 'ComplexType'
-        data = output.data
-    elif output.dataType == 'BoundingBoxData':
+    elif output.get('data_type') == 'BoundingBoxData':
         category = 'BoundingBoxType'
-        data = ["{0.minx},{0.miny},{0.maxx},{0.maxy}".format(bbox) for bbox in output.data]
     else:
         category = 'LiteralType'
-        data = output.data
-    return dict(title=output.title,
-                abstract=output.abstract,
-                identifier=output.identifier,
-                mime_type=output.mimeType,
-                data=escape_output(data),
-                reference=escape_output(output.reference),
+    return dict(title=output.get('title'),
+                abstract=output.get('abstract'),
+                identifier=output.get('identifier'),
+                mime_type=output.get('mime_type'),
+                data=escape_output(output.get('data')),
+                reference=escape_output(output.get('reference')),
                 category=category)
@@ -8,6 +8,8 @@ from pyramid.response import FileIter
 
 from phoenix.utils import ActionButton
 from phoenix.utils import format_tags
+from phoenix.xmlstore import delete_xml
+from phoenix.dashboard.stats import jobs_removed, reconcile_stats
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
@@ -44,7 +46,9 @@ class NodeActions(object):
     def delete_job(self):
         job_id = self.request.matchdict.get('job_id')
         # TODO: check permission ... either admin or owner.
+        jobs_removed(self.request.db, [job_id])
         self.collection.delete_one({'identifier': job_id})
+        delete_xml(self.request.db, [job_id])
         self.session.flash("Job {0} deleted.".format(job_id), queue='info')
         return HTTPFound(location=self.request.route_path('monitor'))
 
@@ -55,7 +59,9 @@ class NodeActions(object):
         """
         ids = self._selected_children()
         if ids is not None:
+            jobs_removed(self.request.db, ids)
             self.collection.delete_many({'identifier': {'$in': ids}})
+            delete_xml(self.request.db, ids)
             self.session.flash("Selected jobs were deleted.", queue='info')
         return HTTPFound(location=self.request.route_path('monitor'))
 
@@ -63,6 +69,8 @@ class NodeActions(object):
     def delete_all_jobs(self):
         count = self.collection.count()
         self.collection.drop()
+        self.request.db.job_xml.drop()
+        reconcile_stats(self.request.db)
         self.session.flash("{0} Jobs deleted.".format(count), queue='info')
         return HTTPFound(location=self.request.route_path('monitor'))
 
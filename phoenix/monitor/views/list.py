@@ -14,6 +14,7 @@ from phoenix.grid import CustomGrid
 from phoenix.views import MyView
 from phoenix.monitor.views.actions import monitor_buttons
 from phoenix.utils import make_tags
+from phoenix.monitor.queries import jobs_filter, counts_pipeline, count_jobs, JOB_PROJECTION
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
@@ -50,7 +51,10 @@ class JobList(MyView):
         super(JobList, self).__init__(request, name='monitor', title='Job List')
         self.collection = self.request.db.jobs
 
-    def filter_jobs(self, page=0, limit=10, tag=None, access=None, status=None, sort='created'):
+    def query_jobs(self, page=0, limit=10, tag=None, access=None, status=None, sort='created'):
+        """
+        Returns one page of jobs and the number of jobs for each status.
+        """
         search_filter = {}
         if access == 'public':
             search_filter['tags'] = 'public'
@@ -63,22 +67,18 @@ class JobList(MyView):
             if tag is not None:
                 search_filter['tags'] = tag
             search_filter['userid'] = authenticated_userid(self.request)
-        if status == 'Running':
-            search_filter['status'] = {'$in': ['ProcessAccepted', 'ProcessPaused', 'ProcessStarted']}
-        elif status == 'Finished':
-            search_filter['status'] = {'$in': ['ProcessSucceeded', 'ProcessFailed']}
-        elif status:
-            search_filter['status'] = status
-        count = self.collection.find(search_filter).count()
         if sort == 'user':
             sort = 'userid'
         elif sort == 'process':
             sort = 'title'
 
         sort_order = DESCENDING if sort == 'finished' or sort == 'created' else ASCENDING
-        sort_criteria = [(sort, sort_order)]
-        items = list(self.collection.find(search_filter).skip(page * limit).limit(limit).sort(sort_criteria))
-        return items, count
+        # the page is sorted with an index, only the counts are aggregated
+        items = list(self.collection.find(jobs_filter(search_filter, status), JOB_PROJECTION)
+                     .sort([(sort, sort_order)]).skip(page * limit).limit(limit))
+        counts = dict((group['_id'], group['count'])
+                      for group in self.collection.aggregate(counts_pipeline(search_filter)))
+        return items, counts
 
     def generate_caption_form(self, formid="deform_caption"):
         """This helper code generates the form that will be used to add
@@ -161,10 +161,10 @@ class JobList(MyView):
                 LOGGER.debug("button url = %s", location)
                 return HTTPFound(location, request=self.request)
 
-        items, count = self.filter_jobs(page=page, limit=limit, tag=tag, access=access, status=status, sort=sort)
-        # TODO: use mongodb aggregation to get counts by status
-        _, count_running = self.filter_jobs(page=page, limit=0, tag=tag, access=access, status='Running', sort=sort)
-        _, count_finished = self.filter_jobs(page=page, limit=0, tag=tag, access=access, status='Finished', sort=sort)
+        items, counts = self.query_jobs(page=page, limit=limit, tag=tag, access=access, status=status, sort=sort)
+        count = count_jobs(counts, status)
+        count_running = count_jobs(counts, 'Running')
+        count_finished = count_jobs(counts, 'Finished')
 
         grid = JobsGrid(self.request, items,
                         ['_checkbox', 'status', 'user', 'process', 'service', 'caption',
@@ -174,6 +174,7 @@ class JobList(MyView):
                     access=access, status=status,
                     page=page, limit=limit, tag=tag, sort=sort,
                     count=count, count_running=count_running, count_finished=count_finished,
+                    jobs=items,
                     buttons=buttons,
                     caption_form=caption_form.render(),
                     labels_form=labels_form.render())
@@ -14,9 +14,6 @@ class JobListJson(JobList):
     @view_config(route_name='monitor', renderer='json', accept='application/json')
     def view(self):
         jobs_dict = JobList.view(self)
-        items, count = self.filter_jobs(page=jobs_dict['page'], limit=jobs_dict['limit'], tag=jobs_dict['tag'],
-                                        access=jobs_dict['access'], status=jobs_dict['status'], sort=jobs_dict['sort'])
-
         filtered_dict = {}
         req_props = ['access', 'status', 'page', 'limit', 'tag', 'sort',
                      'count', 'count_running', 'count_finished']
@@ -24,5 +21,5 @@ class JobListJson(JobList):
             if prop in jobs_dict:
                 filtered_dict[prop] = jobs_dict[prop]
 
-        filtered_dict['jobs'] = items
+        filtered_dict['jobs'] = jobs_dict['jobs']
         return filtered_dict
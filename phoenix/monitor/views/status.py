@@ -1,7 +1,7 @@
 from pyramid.view import view_config, view_defaults
 
 from phoenix.views import MyView
-from phoenix.wps import check_status
+from phoenix.wps import job_data
 from phoenix.monitor.utils import output_details
 
 
@@ -24,11 +24,11 @@ class JobStatus(MyView):
             status = job['status']
             log = job.get('log', ['No status message'])
             if status == 'ProcessSucceeded':
-                execution = check_status(job['status_location'], verify=False)
-                for output in execution.processOutputs:
-                    if output.identifier == 'output':
+                outputs = job_data(self.request.db, job, 'outputs')
+                for output in outputs:
+                    if output['identifier'] == 'output':
                         break
-                details = output_details(self.request, output)
+                details = output_details(self.request, output) if outputs else {}
                 if details.get('reference'):
                     result = '<a href="{0}" class="btn btn-success btn-xs" target="_blank">Show Output</a>'.format(
                         details['reference'])
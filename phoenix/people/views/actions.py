@@ -4,6 +4,8 @@ from pyramid.security import authenticated_userid
 from pyramid.compat import escape
 
 from phoenix.twitcherclient import generate_access_token
+from phoenix.events import UserChanged
+from phoenix.dashboard.stats import user_removed
 from phoenix.esgf.slcsclient import ESGFSLCSClient
 
 
@@ -101,7 +103,11 @@ class Actions(object):
     @view_config(route_name='delete_user', permission='admin')
     def delete_user(self):
         if self.userid:
-            self.collection.remove(dict(identifier=self.userid))
+            user = self.collection.find_one_and_delete(dict(identifier=self.userid))
+            if user is not None:
+                user_removed(self.request.db, user.get('group'))
+            self.request.db.cart.delete_many({'userid': self.userid})
+            self.request.registry.notify(UserChanged(self.request.registry, self.userid))
             self.session.flash('User removed', queue="info")
         return HTTPFound(location=self.request.route_path('people'))
 
@@ -6,6 +6,8 @@ from pyramid.httpexceptions import HTTPFound
 
 from deform import Form, ValidationFailure, Button
 
+from phoenix.events import UserChanged
+from phoenix.dashboard.stats import user_group_changed
 from phoenix.views import MyView
 from phoenix.utils import ActionButton
 from phoenix.people.schema import (
@@ -96,10 +98,13 @@ class Profile(MyView):
         try:
             controls = list(self.request.POST.items())
             appstruct = form.validate(controls)
+            group = self.user.get('group')
             for key in ['name', 'email', 'organisation', 'notes', 'group']:
                 if key in appstruct:
                     self.user[key] = appstruct.get(key)
             self.collection.update({'identifier': self.userid}, self.user)
+            user_group_changed(self.request.db, group, self.user.get('group'))
+            self.request.registry.notify(UserChanged(self.request.registry, self.userid))
         except ValidationFailure as e:
             LOGGER.exception('validation of form failed.')
             return dict(form=e.render())
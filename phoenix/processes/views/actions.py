@@ -1,8 +1,7 @@
 from pyramid.view import view_config, view_defaults
 
-from owslib.wps import WebProcessingService
-
 from phoenix.catalog import WPS_TYPE
+from phoenix.wps import get_wps
 
 
 def includeme(config):
@@ -22,8 +21,6 @@ class ProcessesActions(object):
         processes = {}
         for service in self.request.catalog.get_services(service_type=WPS_TYPE):
             service_name = self.request.catalog.get_service_name(service)
-            wps = WebProcessingService(
-                url=self.request.route_url('owsproxy', service_name=service_name),
-                verify=False)
+            wps = get_wps(self.request, service_name)
             processes[service_name] = [process.identifier for process in wps.processes]
         return processes
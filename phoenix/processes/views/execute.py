@@ -8,13 +8,13 @@ from deform import ValidationFailure
 from phoenix.events import JobStarted
 from phoenix.views import MyView
 from phoenix.wps import appstruct_to_inputs
-from phoenix.wps import WPSSchema
-from phoenix.wps import check_status
+from phoenix.wps import wps_schema
+from phoenix.wps import job_data
+from phoenix.wps import get_wps, describe_process
 from phoenix.utils import wps_describe_url
 from phoenix.security import has_execute_permission
 from phoenix.security import check_csrf_token
 
-from owslib.wps import WebProcessingService
 from owslib.wps import WPSExecution
 from owslib.wps import ComplexDataInput, BoundingBoxDataInput
 from owslib.wps import is_reference
@@ -27,7 +27,7 @@ LOGGER = logging.getLogger("PHOENIX")
 class ExecuteProcess(MyView):
     def __init__(self, request):
         self.request = request
-        self.execution = None
+        self.inputs = None
         self.service_name = None
         self.processid = None
         self.process = None
@@ -35,23 +35,15 @@ class ExecuteProcess(MyView):
             job = request.db.jobs.find_one(
                 {'identifier': request.params['job_id']})
             self.service_name = job.get('service_name')
-            self.execution = check_status(
-                url=job.get('status_location'),
-                response=job.get('response'),
-                verify=False, sleep_secs=0)
-            self.processid = self.execution.process.identifier
+            self.inputs = job_data(request.db, job, 'inputs')
+            self.processid = job.get('process_id')
         elif 'wps' in request.params:
             self.service_name = request.params.get('wps')
             self.processid = request.params.get('process')
 
         if self.service_name:
-            # TODO: avoid getcaps
-            self.wps = WebProcessingService(
-                url=request.route_url('owsproxy',
-                                      service_name=self.service_name),
-                verify=False)
-            # TODO: need to fix owslib to handle special identifiers
-            self.process = self.wps.describeprocess(self.processid)
+            self.wps = get_wps(request, self.service_name)
+            self.process = describe_process(request, self.service_name, self.processid)
         super(ExecuteProcess, self).__init__(request, name='processes_execute', title='')
 
     def breadcrumbs(self):
@@ -66,18 +58,18 @@ class ExecuteProcess(MyView):
     def appstruct(self):
         # TODO: not a nice way to get inputs ... should be cleaned up in owslib
         result = {}
-        if self.execution:
-            for inp in self.execution.dataInputs:
-                if inp.data or inp.reference:
-                    if inp.identifier not in result:
+        if self.inputs:
+            for inp in self.inputs:
+                if inp['data'] or inp['reference']:
+                    if inp['identifier'] not in result:
                         # init result for param with empty list
-                        result[inp.identifier] = []
-                    if inp.data:
-                        # add literal input, inp.data is a list
-                        result[inp.identifier].extend(inp.data)
-                    elif inp.reference:
+                        result[inp['identifier']] = []
+                    if inp['data']:
+                        # add literal input, inp['data'] is a list
+                        result[inp['identifier']].extend(inp['data'])
+                    elif inp['reference']:
                         # add reference to complex input
-                        result[inp.identifier].append(inp.reference)
+                        result[inp['identifier']].append(inp['reference'])
         for inp in self.process.dataInputs:
             # TODO: dupliate code in wizard.start
             # convert boolean
@@ -89,25 +81,21 @@ class ExecuteProcess(MyView):
                 result[inp.identifier] = [dateparser.parse(val) for val in result[inp.identifier]]
             elif 'time' in inp.dataType and inp.identifier in result:
                 result[inp.identifier] = [dateparser.parse(val) for val in result[inp.identifier]]
-            elif inp.dataType == 'BoundingBoxData' and inp.identifier in result:
-                result[inp.identifier] = [
-                    "{0.minx},{0.miny},{0.maxx},{0.maxy}".format(bbox) for bbox in result[inp.identifier]]
             # TODO: very dirty ... if single value then take the first
             if inp.maxOccurs < 2 and inp.identifier in result:
                 result[inp.identifier] = result[inp.identifier][0]
         return result
 
     def generate_form(self, formid='deform'):
-        schema = WPSSchema(request=self.request,
-                           process=self.process,
-                           use_async=self.request.has_permission('admin'),
-                           user=self.request.user)
+        schema = wps_schema(self.request, self.service_name, self.process,
+                            use_async=self.request.has_permission('admin'),
+                            user=self.request.user)
         submit_button = Button(name='submit', title='Submit',
                                css_class='btn btn-success btn-lg btn-block',
                                disabled=not has_execute_permission(
                                     self.request, self.service_name))
         return Form(
-            schema.bind(request=self.request),
+            schema,
             buttons=(submit_button,),
             formid=formid,
         )
@@ -1,9 +1,8 @@
 from pyramid.view import view_config, view_defaults
 
-from owslib.wps import WebProcessingService
-
 from phoenix.views import MyView
 from phoenix.utils import wps_caps_url
+from phoenix.wps import get_wps
 
 
 def get_process_media(process):
@@ -17,9 +16,7 @@ def get_process_media(process):
 class ProcessList(MyView):
     def __init__(self, request):
         self.service_name = request.params.get('wps')
-        self.wps = WebProcessingService(
-            url=request.route_url('owsproxy', service_name=self.service_name),
-            verify=False)
+        self.wps = get_wps(request, self.service_name)
         super(ProcessList, self).__init__(request, name='processes_list', title='')
 
     @view_config(
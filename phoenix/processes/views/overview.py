@@ -1,10 +1,8 @@
 from pyramid.view import view_config, view_defaults
 
-from owslib.wps import WebProcessingService
-
 from phoenix.catalog import WPS_TYPE
 from phoenix.views import MyView
-from phoenix.utils import headline
+from phoenix.utils import pinned_processes
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
@@ -29,28 +27,7 @@ class Overview(MyView):
         return items
 
     def pinned_processes(self):
-        settings = self.request.db.settings.find_one() or {}
-        processes = []
-        if 'pinned_processes' in settings:
-            for pinned in settings.get('pinned_processes'):
-                try:
-                    service_name, identifier = pinned.split('.', 1)
-                    url = self.request.route_path(
-                        'processes_execute', _query=[('wps', service_name), ('process', identifier)])
-                    wps = WebProcessingService(
-                        url=self.request.route_url('owsproxy', service_name=service_name), verify=False)
-                    # TODO: need to fix owslib to handle special identifiers
-                    process = wps.describeprocess(identifier)
-                    description = headline(process.abstract)
-                except Exception:
-                    LOGGER.warn("could not add pinned process %s", pinned)
-                else:
-                    processes.append(dict(
-                        title=process.identifier,
-                        description=description,
-                        url=url,
-                        service_title=wps.identification.title))
-        return processes
+        return pinned_processes(self.request)
 
     @view_config(
         route_name='processes',
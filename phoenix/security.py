@@ -14,6 +14,7 @@ from pyramid.security import (
     Authenticated,
     ALL_PERMISSIONS)
 from pyramid.security import unauthenticated_userid
+from pyramid.events import subscriber
 from pyramid.settings import asbool
 from pyramid.csrf import check_csrf_token as _check_csrf_token
 
@@ -22,6 +23,8 @@ from authomatic.providers import oauth2
 from phoenix.providers import esgfopenid
 from phoenix.providers.oauth2 import CEDAProvider
 
+from phoenix.cache import cache_factory
+from phoenix.events import UserChanged
 from phoenix.twitcherclient import is_public
 
 import logging
@@ -82,16 +85,36 @@ def passwd_check(request, passphrase):
     return h.hexdigest() == pw_digest
 
 
+def group_cache(registry):
+    return cache_factory(registry, 'groups', ttl=60, max_size=1024)
+
+
+@subscriber(UserChanged)
+def invalidate_group_cache(event):
+    group_cache(event.registry).invalidate(event.userid)
+
+
+def find_group(request, userid):
+    """
+    Returns the group of ``userid``. It is cached for all requests of this worker
+    until the user is changed (see ``UserChanged``).
+    """
+    def create():
+        user = request.db.users.find_one({'identifier': userid}, {'group': 1})
+        return user.get('group') if user else None
+    return group_cache(request.registry).get_or_create(userid, create)
+
+
 def groupfinder(userid, request):
-    user = request.db.users.find_one({'identifier': userid})
-    if user:
-        if user.get('group') == Admin:
-            return [Admin]
-        elif user.get('group') == Developer:
-            return [Developer]
-        elif user.get('group') == User:
-            return [User]
-    return [Guest]
+    # permissions are checked many times per request
+    memo = request.__dict__.setdefault('_phoenix_principals', {})
+    if userid not in memo:
+        group = find_group(request, userid)
+        if group in (Admin, Developer, User):
+            memo[userid] = [group]
+        else:
+            memo[userid] = [Guest]
+    return memo[userid]
 
 
 # Authentication and Authorization
@@ -197,6 +220,37 @@ def get_user(request):
         return user
 
 
+class UserLabels(object):
+    """
+    Request scoped cache of the user names and login ids shown in views.
+    """
+    projection = {'identifier': 1, 'login_id': 1, 'name': 1}
+
+    def __init__(self, request):
+        self.request = request
+        self.users = {}
+
+    def prefetch(self, userids):
+        """Loads all given users with one query."""
+        missing = set(userid for userid in userids if userid and userid not in self.users)
+        if missing:
+            for user in self.request.db.users.find({'identifier': {'$in': list(missing)}}, self.projection):
+                self.users[user['identifier']] = user
+            for userid in missing:
+                self.users.setdefault(userid, None)
+
+    def get(self, userid):
+        if userid and userid not in self.users:
+            self.prefetch([userid])
+        return self.users.get(userid)
+
+    def label(self, userid, attribute='name', default='Unknown'):
+        user = self.get(userid)
+        if user:
+            return user.get(attribute)
+        return default
+
+
 def includeme(config):
     settings = config.get_settings()
 
@@ -209,6 +263,7 @@ def includeme(config):
     config.set_authentication_policy(authn_policy)
     config.set_authorization_policy(authz_policy)
     config.add_request_method(get_user, 'user', reify=True)
+    config.add_request_method(UserLabels, 'user_labels', reify=True)
 
     # is csrf checking activated?
     def require_csrf(request):
@@ -6,6 +6,7 @@
       var defaults = {
         oid: null,
         url: null,
+        datasetsUrl: null,
         constraints: null,
         categories: null,
         keywords: null,
@@ -18,6 +19,7 @@
 
       var init = function() {
         initDatasetCollapse();
+        initMoreDatasets();
         initToggleCollapse();
         initSearchOptions();
         initQuery();
@@ -81,8 +83,74 @@
         return text;
       };
 
+      var _buildDatasetPanel = function(result, number) {
+        var text = '<div class="panel panel-default">';
+        text += '<div class="panel-heading" role="tab" id="heading-' + number + '">';
+        text += '<h4 class="panel-title">';
+        text += '<a class="collapsed" role="button" data-toggle="collapse" data-parent="#accordion"';
+        text += ' href="#collapse-' + number + '" aria-expanded="false" aria-controls="collapse-' + number + '">';
+        text += '<i class="fa fa-chevron-right"></i> ' + result.title;
+        text += ' <span class="badge">' + result.size + '</span>';
+        text += ' <span class="badge">' + result.number_of_files + '</span>';
+        text += '</a></h4></div>';
+        text += '<div id="collapse-' + number + '" class="panel-collapse collapse dataset" role="tabpanel"';
+        text += ' aria-labelledby="heading-' + number + '">';
+        text += '<div class="panel-body"><ul class="list-group">';
+        text += '<li class="list-group-item list-group-item-warning">';
+        text += '<span class="list-group-item-heading">';
+        if (result.cart_available) {
+          text += '<btn class="btn btn-default btn-xs pull-right';
+          if (result.is_in_cart) {
+            text += ' btn-cart-remove" title="Remove from Cart"';
+          } else {
+            text += ' btn-cart-add" title="Add to Cart"';
+          }
+          text += ' data-toggle="tooltip" data-value="' + result.catalog_url + '"';
+          text += ' data-type="application/x-thredds-catalog" role="button">';
+          if (result.is_in_cart) {
+            text += '<icon class="fa fa-lg fa-times"></icon>';
+          } else {
+            text += '<icon class="fa fa-lg fa-cart-plus"></icon>';
+          }
+          text += '</btn>';
+        }
+        text += result.title;
+        text += '</span>';
+        text += '<p class="list-group-item-text">';
+        text += '<a href="' + result.catalog_url + '" target="_"><i class="fa fa-book"></i> Catalog</a>';
+        text += '</p>';
+        text += '</li>';
+        text += '<div dataset_id="' + result.dataset_id + '" class="items"/>';
+        text += '</ul></div></div></div>';
+        return text;
+      };
+
+      var initMoreDatasets = function() {
+        // load next result page without facets
+        $('#' + searchOptions.oid + '-more').click(function () {
+          var btn = $(this);
+          var offset = parseInt(btn.attr('data-offset'));
+          var limit = parseInt(btn.attr('data-limit'));
+          var waitDialog = $('#please-wait-dialog');
+          waitDialog.modal('show');
+          $.getJSON(buildDatasetPageQuery(offset, limit), function(result) {
+            var html = '';
+            $.each(result.results, function(i, item) {
+              html += _buildDatasetPanel(item, offset + i + 1);
+            });
+            $('#accordion').append(html);
+            if (result.hit_count > offset + limit) {
+              btn.attr('data-offset', offset + limit);
+            } else {
+              btn.hide();
+            }
+            waitDialog.modal('hide');
+          });
+        });
+      };
+
       var initDatasetCollapse = function() {
-        $('.dataset').on('show.bs.collapse', function () {
+        $('#accordion').on('show.bs.collapse', '.dataset', function () {
           var _el = $(this);
           var dataset_id = $(this).find('.items').attr('dataset_id');
           var waitDialog = $('#please-wait-dialog');
@@ -93,6 +161,9 @@
             $.each(result.items, function(i, item) {
               html += _buildListGroupItem(item);
             });
+            if (result.partial) {
+              html += '<li class="list-group-item list-group-item-warning">Search timed out. Some files may be missing.</li>';
+            }
             _el.find('.items').html(html);
             waitDialog.modal('hide');
           });
@@ -100,7 +171,7 @@
       };
 
       var initToggleCollapse = function() {
-        $('a[data-toggle="collapse"]').click(function () {
+        $(document.body).on('click', 'a[data-toggle="collapse"]', function () {
           $(this).find('i').toggleClass('fa-chevron-right fa-chevron-down');
         })
       };
@@ -327,6 +398,12 @@
         return _buildQuery(searchURL);
       };
 
+      var buildDatasetPageQuery = function(offset, limit) {
+        var searchURL = searchOptions.datasetsUrl + '?';
+        searchURL += 'facets=false&offset=' + offset + '&limit=' + limit;
+        return _buildQuery(searchURL);
+      };
+
       var buildItemsSearchQuery = function(dataset_id) {
         var searchURL = "/esgfsearch/items?";
         searchURL += "dataset_id=" + dataset_id;
@@ -2,7 +2,11 @@ $('#fine-uploader').fineUploader({
   debug: true,
   template: 'qq-template',
   request: {
-    endpoint: '/upload'
+    endpoint: '/upload',
+    // send files as request body and the parameters in the query string,
+    // so files can be streamed to the storage
+    forceMultipart: false,
+    paramsInBody: false
   },
   thumbnails: {
     placeholders: {
@@ -25,7 +29,7 @@ $('#fine-uploader').fineUploader({
     endpoint: '/upload'
   },
   resume: {
-    enabled: false
+    enabled: true
   },
   retry: {
     enableAuto: true,
@@ -11,3 +11,4 @@ def includeme(config):
     config.add_route('download_storage', 'download/storage/{filename:.*}')
     config.add_route('upload', 'upload')
     config.add_route('upload_delete', 'upload/{uuid}')
+    config.add_route('upload_parts', 'upload/{uuid}/parts')
@@ -0,0 +1,124 @@
+"""
+Content-addressed deduplication of stored files.
+
+Enabled with ``phoenix.storage.dedup = true``. Each stored file is hard
+linked to a blob named by its SHA-256 digest in the ``.blobs`` folder of the
+storage. When a file with the same content is stored again, it is replaced
+by a hard link to the existing blob, so identical files are kept once on
+disk while every upload keeps its own path and url. The link count of a
+blob is its reference count: blobs which are no longer linked by any stored
+file are removed by :func:`collect_blobs`.
+"""
+
+import os
+import re
+import uuid
+import hashlib
+
+from pyramid.settings import asbool
+
+from phoenix.storage.utils import BUFFER_SIZE
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+BLOB_FOLDER = '.blobs'
+HEXDIGEST = re.compile('[0-9a-f]{64}')
+
+
+def dedup_enabled(settings):
+    return asbool((settings or {}).get('phoenix.storage.dedup', 'false'))
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of file ``path``."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        while True:
+            buf = fp.read(BUFFER_SIZE)
+            if not buf:
+                break
+            digest.update(buf)
+    return digest.hexdigest()
+
+
+def blob_path(base_path, hexdigest):
+    return os.path.join(base_path, BLOB_FOLDER, hexdigest[:2], hexdigest[2:])
+
+
+def link_blob(base_path, path, hexdigest=None):
+    """
+    Deduplicates the stored file ``path`` and returns its digest.
+
+    The file becomes a hard link of the blob with the same content. If there
+    is no such blob yet, the file itself becomes the blob.
+    """
+    hexdigest = hexdigest or file_digest(path)
+    blob = blob_path(base_path, hexdigest)
+    try:
+        if not os.path.exists(os.path.dirname(blob)):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+            return hexdigest
+        except FileExistsError:
+            pass
+        if os.path.samefile(path, blob):
+            return hexdigest
+        if os.path.getsize(blob) != os.path.getsize(path):
+            LOGGER.warning("blob %s has a different size than %s.", blob, path)
+            return hexdigest
+        # replace file by a link to the existing blob
+        tmp_path = '{}.{}.link'.format(path, uuid.uuid4().hex)
+        os.link(blob, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # hard links not supported, keep the file as it is
+        LOGGER.exception("could not deduplicate %s.", path)
+    return hexdigest
+
+
+def linked_blobs(base_path, folder):
+    """
+    Returns the blobs linked by the stored files in ``folder``. They are found
+    by the digests in the ``.sha256`` files written next to the stored files.
+    """
+    blobs = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith('.sha256'):
+                continue
+            try:
+                with open(os.path.join(root, name)) as fp:
+                    hexdigest = fp.read().split(None, 1)[0]
+            except (IOError, IndexError):
+                LOGGER.warning("could not read digest %s.", name)
+                continue
+            # the digest names a file which may be removed
+            if not HEXDIGEST.fullmatch(hexdigest):
+                LOGGER.warning("invalid digest in %s.", name)
+                continue
+            blobs.append(blob_path(base_path, hexdigest))
+    return blobs
+
+
+def collect_blobs(base_path, blobs=None):
+    """
+    Removes the blobs which are not linked by stored files anymore. Only the
+    given ``blobs`` are checked, by default all blobs of the storage.
+    Returns the number of removed blobs.
+    """
+    if blobs is None:
+        blobs = [os.path.join(root, name)
+                 for root, _, files in os.walk(os.path.join(base_path, BLOB_FOLDER)) for name in files]
+    removed = 0
+    for path in blobs:
+        try:
+            if os.stat(path).st_nlink == 1:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            LOGGER.exception("could not remove blob %s.", path)
+    return removed
@@ -0,0 +1,154 @@
+"""
+Responses for downloads of stored files.
+
+Supports conditional requests (``ETag``, ``Last-Modified``, 304) and single
+and multiple byte ranges. With ``phoenix.storage.x_accel_redirect`` set to
+an internal nginx location, e.g. ``/protected/storage/``, the transfer is
+handed off to nginx with an ``X-Accel-Redirect`` header.
+"""
+
+import os
+import re
+import uuid
+import mimetypes
+from urllib.parse import quote
+
+from pyramid.response import Response, FileResponse
+
+from phoenix.storage.utils import BUFFER_SIZE
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+RANGE_SPEC = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+# more ranges are answered with the whole file
+MAX_RANGES = 20
+
+
+def file_etag(stat):
+    return "{:x}-{:x}-{:x}".format(stat.st_ino, int(stat.st_mtime), stat.st_size)
+
+
+def parse_ranges(header, size):
+    """
+    Parses a ``Range`` header and returns the list of (start, stop) byte
+    positions, with ``stop`` excluded. Returns None if the header is invalid
+    and an empty list if none of the ranges is satisfiable.
+    """
+    if not header or '=' not in header:
+        return None
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC.match(spec)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:  # suffix range: last n bytes
+            start, stop = max(size - int(last), 0), size
+            if int(last) == 0:
+                continue
+        else:
+            start = int(first)
+            stop = min(int(last) + 1, size) if last else size
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, stop))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def iter_range(path, start, stop, block_size=BUFFER_SIZE):
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            buf = fp.read(min(block_size, remaining))
+            if not buf:
+                break
+            remaining -= len(buf)
+            yield buf
+
+
+def iter_multipart(path, ranges, size, content_type, boundary):
+    for start, stop in ranges:
+        yield "--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n".format(
+            boundary, content_type, start, stop - 1, size).encode('ascii')
+        for buf in iter_range(path, start, stop):
+            yield buf
+        yield b"\r\n"
+    yield "--{}--\r\n".format(boundary).encode('ascii')
+
+
+def multipart_length(ranges, size, content_type, boundary):
+    length = len("--{}--\r\n".format(boundary))
+    for start, stop in ranges:
+        length += len("--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n".format(
+            boundary, content_type, start, stop - 1, size)) + stop - start + 2
+    return length
+
+
+def not_modified(request, response):
+    """If-None-Match takes precedence over If-Modified-Since."""
+    if request.if_none_match:
+        return response.etag in request.if_none_match
+    if request.if_modified_since:
+        return request.if_modified_since >= response.last_modified
+    return False
+
+
+def file_response(request, path, filename):
+    """
+    Returns the response for downloading the stored file ``path``. ``filename``
+    is its name relative to the storage.
+    """
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(path, strict=False)[0] or 'application/octet-stream'
+    response = Response(content_type=content_type)
+    response.etag = file_etag(stat)
+    response.last_modified = int(stat.st_mtime)
+    response.accept_ranges = 'bytes'
+
+    x_accel_redirect = request.registry.settings.get('phoenix.storage.x_accel_redirect')
+    if x_accel_redirect:
+        # nginx sends the file, including ranges and conditional responses
+        response.headers['X-Accel-Redirect'] = x_accel_redirect.rstrip('/') + '/' + quote(filename)
+        return response
+
+    if not_modified(request, response):
+        response.status_int = 304
+        return response
+
+    ranges = None
+    if 'Range' in request.headers:
+        # ranges of an outdated version are ignored
+        if response in request.if_range:
+            ranges = parse_ranges(request.headers.get('Range'), stat.st_size)
+    if ranges is None:
+        whole = FileResponse(path, request=request, content_type=content_type)
+        whole.etag = response.etag
+        whole.accept_ranges = 'bytes'
+        return whole
+    if not ranges:
+        response.status_int = 416
+        response.content_range = 'bytes */{}'.format(stat.st_size)
+        return response
+
+    response.status_int = 206
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response.content_range = 'bytes {}-{}/{}'.format(start, stop - 1, stat.st_size)
+        response.app_iter = iter_range(path, start, stop)
+        response.content_length = stop - start
+    else:
+        boundary = uuid.uuid4().hex
+        response.headers['Content-Type'] = 'multipart/byteranges; boundary={}'.format(boundary)
+        response.app_iter = iter_multipart(path, ranges, stat.st_size, content_type, boundary)
+        response.content_length = multipart_length(ranges, stat.st_size, content_type, boundary)
+    return response
@@ -0,0 +1,125 @@
+import io
+import os
+import hashlib
+import tempfile
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+# buffer size of copies which can not be done by the kernel
+BUFFER_SIZE = 1024 * 1024
+
+
+class FileSizeLimitExceeded(Exception):
+    """
+    Raised if an upload is larger than the allowed size.
+    """
+
+
+def _fileno(fp):
+    try:
+        return fp.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+def _copy_fd(in_fd, out_fd, offset, count):
+    """
+    Copies ``count`` bytes of ``in_fd`` starting at ``offset`` to the current
+    position of ``out_fd`` inside the kernel. Returns the number of copied bytes.
+    """
+    copied = 0
+    use_copy_file_range = hasattr(os, 'copy_file_range')
+    while copied < count:
+        if use_copy_file_range:
+            try:
+                sent = os.copy_file_range(in_fd, out_fd, count - copied, offset + copied)
+            except OSError:
+                # not supported by file system or kernel
+                use_copy_file_range = False
+                continue
+        else:
+            sent = os.sendfile(out_fd, in_fd, offset + copied, count - copied)
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def check_size(size, max_size):
+    """Raises :class:`FileSizeLimitExceeded` if ``size`` is larger than ``max_size`` bytes."""
+    if max_size is not None and size > max_size:
+        raise FileSizeLimitExceeded("Maximum file size: {}MB".format(max_size // 1048576))
+
+
+def copy_file(source, destination, max_size=None):
+    """
+    Copies the file object ``source`` from its current position to the file
+    object ``destination`` and returns the number of copied bytes.
+
+    Real files are copied with ``copy_file_range`` or ``sendfile``, other
+    file objects are copied with a fixed size buffer. Raises
+    :class:`FileSizeLimitExceeded` if there are more than ``max_size`` bytes.
+    """
+    in_fd = _fileno(source)
+    out_fd = _fileno(destination)
+    if in_fd is not None and out_fd is not None and hasattr(os, 'sendfile'):
+        offset = source.tell()
+        check_size(os.fstat(in_fd).st_size - offset, max_size)
+        destination.flush()
+        start = os.lseek(out_fd, 0, os.SEEK_CUR)
+        try:
+            copied = _copy_fd(in_fd, out_fd, offset, os.fstat(in_fd).st_size - offset)
+        except OSError:
+            LOGGER.debug("zero-copy failed, using buffered copy.")
+            os.ftruncate(out_fd, start)
+            os.lseek(out_fd, start, os.SEEK_SET)
+        else:
+            source.seek(offset + copied)
+            return copied
+    copied = 0
+    while True:
+        buf = source.read(BUFFER_SIZE)
+        if not buf:
+            break
+        copied += len(buf)
+        check_size(copied, max_size)
+        destination.write(buf)
+    return copied
+
+
+def write_stream(fp, path, max_size=None):
+    """
+    Writes the file object ``fp`` to ``path`` with a fixed size buffer and
+    returns its size and SHA-256 hex digest.
+
+    Raises :class:`FileSizeLimitExceeded` as soon as more than ``max_size``
+    bytes are read. The file is written to a temporary file next to ``path``
+    and renamed when it is complete.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            while True:
+                buf = fp.read(BUFFER_SIZE)
+                if not buf:
+                    break
+                size += len(buf)
+                check_size(size, max_size)
+                digest.update(buf)
+                destination.write(buf)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def write_digest(path, hexdigest):
+    """
+    Records the SHA-256 digest of ``path`` in ``<path>.sha256`` (``sha256sum`` format).
+    """
+    with open(path + '.sha256', 'w') as fp:
+        fp.write("{}  {}\n".format(hexdigest, os.path.basename(path)))
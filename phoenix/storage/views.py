@@ -1,21 +1,39 @@
 import os
+import json
 import shutil
+import tempfile
 
 from cgi import FieldStorage
 
 from pyramid.view import view_config
-from pyramid.response import FileResponse
+from pyramid.httpexceptions import HTTPNotFound
 
 from pyramid_storage.exceptions import FileNotAllowed
+from pyramid_storage.utils import secure_filename
+
+from phoenix.storage.download import file_response
+from phoenix.storage.utils import copy_file, check_size, write_stream, write_digest, FileSizeLimitExceeded
+from phoenix.storage.dedup import dedup_enabled, link_blob, linked_blobs, collect_blobs, BLOB_FOLDER
 
 import logging
 LOGGER = logging.getLogger("PHOENIX")
 
+# size of the form fields of a multipart upload in addition to the file
+FORM_OVERHEAD = 64 * 1024
+
 
 @view_config(route_name='download_storage')
 def download(request):
-    filename = request.matchdict.get('filename')
-    return FileResponse(request.storage.path(filename))
+    filename = os.path.normpath(request.matchdict.get('filename'))
+    if os.path.isabs(filename) or filename.split(os.sep)[0] in (os.pardir, BLOB_FOLDER):
+        raise HTTPNotFound()
+    base_path = os.path.realpath(request.storage.base_path)
+    path = os.path.realpath(request.storage.path(filename))
+    if not path.startswith(os.path.join(base_path, '')) or not os.path.isfile(path):
+        raise HTTPNotFound()
+    if os.path.relpath(path, base_path).split(os.sep)[0] == BLOB_FOLDER:
+        raise HTTPNotFound()
+    return file_response(request, path, filename)
 
 
 @view_config(route_name='upload_delete', renderer='json', request_method="DELETE", xhr=True, accept="application/json")
@@ -28,88 +46,258 @@ def delete(request):
         handle_delete(request, uuid=request.matchdict.get('uuid'))
         result = {"success": True}
     except Exception as e:
-        result = {"success": False, "error": e.message}
+        result = {"success": False, "error": str(e)}
     return result
 
 
+@view_config(route_name='upload_parts', renderer='json', request_method="GET", accept="application/json")
+def parts(request):
+    """
+    Returns the manifest and the received parts of a chunked upload, so a
+    client can resume it by sending only the missing parts.
+    """
+    chunks_folder = os.path.join(request.storage.path('chunks'), request.matchdict.get('uuid'))
+    manifest = read_manifest(chunks_folder)
+    if manifest is None:
+        return {"success": False, "error": "Unknown upload"}
+    manifest['parts'] = received_parts(chunks_folder)
+    manifest['success'] = True
+    return manifest
+
+
 @view_config(route_name='upload', renderer='json', request_method="POST", xhr=True, accept="application/json")
 def upload(request):
     result = {"success": False}
-    if 'qqfile' in request.POST:
-        try:
-            handle_upload(request, request.POST)
-            filename = os.path.join(request.POST['qquuid'], request.POST['qqfilename'])
+    # reject too large uploads before the body is read
+    if request.content_length and request.content_length > request.max_file_size * 1048576 + FORM_OVERHEAD:
+        msg = "Maximum file size: {}MB".format(request.max_file_size)
+        return {"success": False, 'error': msg, "preventRetry": True}
+    if request.content_type == 'application/octet-stream':
+        # file is sent as request body and the parameters in the query string
+        attrs, fp = request.GET, request.body_file
+    elif 'qqfile' in request.POST:
+        attrs, fp = request.POST, None
+    else:
+        return result
+    try:
+        filename = handle_upload(request, attrs, fp)
+        if filename is None:
+            # part of a chunked upload which is not complete yet
+            result = {'success': True}
+        else:
             result = {'success': True, 'filename': filename}
-        except FileNotAllowed:
-            result = {"success": False, 'error': "Filename extension not allowed", "preventRetry": True}
-        except Exception as e:
-            result = {"success": False, 'error': e.message}
+    except FileNotAllowed:
+        result = {"success": False, 'error': "Filename extension not allowed", "preventRetry": True}
+    except FileSizeLimitExceeded as e:
+        result = {"success": False, 'error': str(e), "preventRetry": True}
+    except Exception as e:
+        result = {"success": False, 'error': str(e)}
     return result
 
 
 def handle_delete(request, uuid):
     """ Handles a filesystem delete based on UUID."""
+    if not uuid or uuid in (BLOB_FOLDER, 'chunks') or os.path.basename(uuid) != uuid or uuid == os.pardir:
+        raise ValueError("Invalid upload {}.".format(uuid))
     location = request.storage.path(uuid)
+    blobs = linked_blobs(request.storage.base_path, location)
     shutil.rmtree(location)
+    if blobs:
+        collect_blobs(request.storage.base_path, blobs)
 
 
-def handle_upload(request, attrs):
+def handle_upload(request, attrs, fp=None):
     """
-    Handle a chunked or non-chunked upload.
+    Handle a chunked or non-chunked upload. Returns the stored filename
+    when the upload is complete, otherwise None.
+
+    The file is read from ``fp`` or from the ``qqfile`` field of a multipart upload.
 
     See example code:
     https://github.com/FineUploader/server-examples/blob/master/python/flask-fine-uploader/app.py
     """
-    fs = attrs['qqfile']
-    # We can fail hard, as somebody is trying to cheat on us if that fails.
-    assert isinstance(fs, FieldStorage)
+    if fp is None:
+        fs = attrs['qqfile']
+        # We can fail hard, as somebody is trying to cheat on us if that fails.
+        assert isinstance(fs, FieldStorage)
+        fp = fs.file
+    max_size = request.max_file_size * 1048576
 
     # extension allowed?
-    request.storage.filename_allowed(attrs['qqfilename'])
+    if not request.storage.filename_allowed(attrs['qqfilename']):
+        raise FileNotAllowed()
 
     # Chunked?
     if 'qqtotalparts' in attrs and int(attrs['qqtotalparts']) > 1:
+        total_parts = int(attrs['qqtotalparts'])
+        too_large = "Maximum file size: {}MB".format(request.max_file_size)
+        if int(attrs.get('qqtotalfilesize', 0)) > max_size:
+            raise FileSizeLimitExceeded(too_large)
         dest_folder = os.path.join(request.storage.path('chunks'), attrs['qquuid'])
-        dest = os.path.join(dest_folder, "parts", str(attrs['qqpartindex']))
-        save_chunk(fs.file, dest)
-
-        # If the last chunk has been sent, combine the parts.
-        if int(attrs['qqtotalparts']) - 1 == int(attrs['qqpartindex']):
-            filename = os.path.join(dest_folder, attrs['qquuid'], attrs['qqfilename'])
-            combine_chunks(
-                int(attrs['qqtotalparts']),
-                source_folder=os.path.dirname(dest),
-                dest=filename)
-            request.storage.save_filename(filename=filename, folder=attrs['qquuid'])
+        write_manifest(dest_folder, dict(
+            filename=attrs['qqfilename'],
+            total_parts=total_parts,
+            total_size=int(attrs.get('qqtotalfilesize', -1))))
+        part_index = int(attrs['qqpartindex'])
+        dest = os.path.join(dest_folder, "parts", str(part_index))
+        # the declared total size is not trusted, the received parts count
+        try:
+            size = save_chunk(fp, dest, max_size=max_size - received_size(dest_folder, skip=part_index))
+        except FileSizeLimitExceeded:
+            shutil.rmtree(dest_folder, ignore_errors=True)
+            raise FileSizeLimitExceeded(too_large)
+        if 'qqchunksize' in attrs and size != int(attrs['qqchunksize']):
+            os.remove(dest)
+            raise Exception("Incomplete chunk {} of {}".format(attrs['qqpartindex'], attrs['qqfilename']))
+
+        # If all parts have been received, combine them. Parts may arrive in any order.
+        if len(received_parts(dest_folder)) == total_parts:
+            if not lock_chunks(dest_folder):
+                raise Exception("Parts of {} are being combined".format(attrs['qqfilename']))
+            try:
+                name, filename = resolve_storage_path(request, attrs['qquuid'], attrs['qqfilename'])
+                combine_chunks(
+                    total_parts,
+                    source_folder=os.path.dirname(dest),
+                    dest=filename,
+                    max_size=max_size)
+            except FileSizeLimitExceeded:
+                shutil.rmtree(dest_folder, ignore_errors=True)
+                raise FileSizeLimitExceeded(too_large)
+            except Exception:
+                # a retry of the last part may combine them again
+                unlock_chunks(dest_folder)
+                raise
             shutil.rmtree(dest_folder)
-    else:  # not chunked
-        request.storage.save_file(fs.file, filename=attrs['qqfilename'], folder=attrs['qquuid'])
+            if dedup_enabled(request.registry.settings):
+                try:
+                    write_digest(filename, link_blob(request.storage.base_path, filename))
+                except Exception:
+                    LOGGER.exception("could not deduplicate upload %s.", filename)
+            return os.path.join(attrs['qquuid'], name)
+    else:  # not chunked, streamed to the storage
+        name, filename = resolve_storage_path(request, attrs['qquuid'], attrs['qqfilename'])
+        size, hexdigest = write_stream(fp, filename, max_size=max_size)
+        write_digest(filename, hexdigest)
+        if dedup_enabled(request.registry.settings):
+            link_blob(request.storage.base_path, filename, hexdigest)
+        LOGGER.debug("stored upload %s (%d bytes)", filename, size)
+        return os.path.join(attrs['qquuid'], name)
+    return None
 
 
-def save_chunk(fs, path):
+def resolve_storage_path(request, folder, filename):
+    """
+    Returns the resolved name and the path of ``filename`` in ``folder`` of the storage.
     """
-    Save an uploaded chunk.
+    dest_folder = request.storage.path(folder)
+    if not os.path.exists(dest_folder):
+        os.makedirs(dest_folder)
+    return request.storage.resolve_name(secure_filename(os.path.basename(filename)), dest_folder)
 
-    Chunks are stored in chunks/
+
+def read_manifest(folder):
+    try:
+        with open(os.path.join(folder, 'manifest.json')) as fp:
+            return json.load(fp)
+    except (IOError, ValueError):
+        return None
+
+
+def write_manifest(folder, manifest):
+    """
+    Writes the manifest of a chunked upload when the first part arrives.
+    """
+    path = os.path.join(folder, 'manifest.json')
+    if os.path.exists(path):
+        return
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=folder)
+    with os.fdopen(fd, 'w') as fp:
+        json.dump(manifest, fp)
+    os.replace(tmp_path, path)
+
+
+def received_parts(folder):
+    """
+    Returns the sorted indexes of the completely received parts.
+    """
+    parts_folder = os.path.join(folder, 'parts')
+    if not os.path.isdir(parts_folder):
+        return []
+    return sorted(int(name) for name in os.listdir(parts_folder) if name.isdigit())
+
+
+def received_size(folder, skip=None):
+    """
+    Returns the number of bytes of the received parts, without the part ``skip``.
+    """
+    parts_folder = os.path.join(folder, 'parts')
+    return sum(os.path.getsize(os.path.join(parts_folder, str(index)))
+               for index in received_parts(folder) if index != skip)
+
+
+def lock_chunks(folder):
+    """
+    Returns True if the caller may combine the parts. Only one request gets the lock.
+    """
+    try:
+        os.close(os.open(os.path.join(folder, 'combining'), os.O_CREAT | os.O_EXCL))
+    except OSError:
+        return False
+    return True
+
+
+def unlock_chunks(folder):
+    try:
+        os.remove(os.path.join(folder, 'combining'))
+    except OSError:
+        pass
+
+
+def save_chunk(fs, path, max_size=None):
+    """
+    Save an uploaded chunk and return its size.
+
+    Chunks are stored in chunks/. The part is written to a temporary file and
+    renamed when it is complete, so only complete parts count as received.
+    Raises :class:`FileSizeLimitExceeded` if the chunk has more than ``max_size`` bytes.
     """
     if not os.path.exists(os.path.dirname(path)):
         os.makedirs(os.path.dirname(path))
-    with open(path, 'wb+') as destination:
-        destination.write(fs.read())
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb', buffering=0) as destination:
+            size = copy_file(fs, destination, max_size=max_size)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return size
 
 
-def combine_chunks(total_parts, source_folder, dest):
+def combine_chunks(total_parts, source_folder, dest, max_size=None):
     """
     Combine a chunked file into a whole file again. Goes through each part,
     in order, and appends that part's bytes to another destination file.
+    Raises :class:`FileSizeLimitExceeded` if the parts have more than ``max_size`` bytes.
 
     Chunks are stored in chunks/
     """
+    parts = [os.path.join(source_folder, str(i)) for i in range(int(total_parts))]
+    check_size(sum(os.path.getsize(part) for part in parts), max_size)
     if not os.path.exists(os.path.dirname(dest)):
         os.makedirs(os.path.dirname(dest))
 
-    with open(dest, 'wb+') as destination:
-        for i in range(int(total_parts)):
-            part = os.path.join(source_folder, str(i))
-            with open(part, 'rb') as source:
-                destination.write(source.read())
+    tmp_dest = dest + '.part'
+    try:
+        with open(tmp_dest, 'wb', buffering=0) as destination:
+            for part in parts:
+                with open(part, 'rb') as source:
+                    copy_file(source, destination)
+        os.replace(tmp_dest, dest)
+    except Exception:
+        if os.path.exists(tmp_dest):
+            os.remove(tmp_dest)
+        raise
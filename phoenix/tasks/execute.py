@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from lxml import etree
 from time import sleep
 
@@ -10,6 +10,8 @@ from owslib.wps import SYNC, ASYNC
 from phoenix.db import mongodb
 from phoenix.events import JobFinished
 from phoenix.tasks.utils import wps_headers, save_log, add_job, wait_secs
+from phoenix.tasks.utils import update_job, use_poller
+from phoenix.tasks.utils import snapshot, save_job, status_changed
 from phoenix.wps import check_status
 
 from celery.utils.log import get_task_logger
@@ -28,6 +30,7 @@ def execute_process(self, url, service_name, identifier, inputs, outputs, async=
         process_id=identifier,
         async=async,
         caption=caption)
+    stored = snapshot(job)
 
     try:
         wps = WebProcessingService(url=url, skip_caps=False, verify=False, headers=wps_headers(userid))
@@ -61,6 +64,14 @@ def execute_process(self, url, service_name, identifier, inputs, outputs, async=
         LOGGER.debug("job init done %s ...", self.request.id)
         LOGGER.debug("status location={}".format(execution.statusLocation))
 
+        if use_poller(registry) and execution.isNotComplete():
+            # hand over to the status poller service
+            job['poll_step'] = 0
+            job['poll_retries'] = 0
+            job['poll_at'] = datetime.now() + timedelta(seconds=wait_secs(0))
+            LOGGER.debug("job %s is watched by status poller", self.request.id)
+            return job['status']
+
         num_retries = 0
         run_step = 0
         while execution.isNotComplete() or run_step == 0:
@@ -69,23 +80,7 @@ def execute_process(self, url, service_name, identifier, inputs, outputs, async=
             try:
                 execution = check_status(url=execution.statusLocation, verify=False,
                                          sleep_secs=wait_secs(run_step))
-                job['response'] = etree.tostring(execution.response)
-                job['status'] = execution.getStatus()
-                job['status_message'] = execution.statusMessage
-                job['progress'] = execution.percentCompleted
-                duration = datetime.now() - job.get('created', datetime.now())
-                job['duration'] = str(duration).split('.')[0]
-
-                if execution.isComplete():
-                    job['finished'] = datetime.now()
-                    if execution.isSucceded():
-                        LOGGER.debug("job succeded")
-                        job['progress'] = 100
-                    else:
-                        LOGGER.debug("job failed.")
-                        job['status_message'] = '\n'.join(error.text for error in execution.errors)
-                        for error in execution.errors:
-                            save_log(job, error)
+                update_job(job, execution)
             except Exception:
                 num_retries += 1
                 LOGGER.exception("Could not read status xml document for job %s. Trying again ...", self.request.id)
@@ -96,14 +91,16 @@ def execute_process(self, url, service_name, identifier, inputs, outputs, async=
                 run_step += 1
             finally:
                 save_log(job)
-                db.jobs.update({'identifier': job['identifier']}, job)
+                # nothing is written while status, progress and message are unchanged
+                if status_changed(job, stored):
+                    stored = save_job(db.jobs, job, stored)
     except Exception as exc:
         LOGGER.exception("Failed to run Job")
         job['status'] = "ProcessFailed"
         job['status_message'] = "Error: {0}".format(exc)
     finally:
         save_log(job)
-        db.jobs.update({'identifier': job['identifier']}, job)
+        save_job(db.jobs, job, stored)
 
-    registry.notify(JobFinished(job))
+    registry.notify(JobFinished(job, registry))
     return job['status']
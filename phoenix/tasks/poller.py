@@ -0,0 +1,146 @@
+"""
+Status poller service for running WPS jobs.
+
+With ``phoenix.poller = true`` the ``execute_process`` task only submits the
+execution and stores when the job should be polled next (``poll_at``). This
+service watches all those jobs in one asyncio loop, so no celery worker is
+blocked while a remote job is running.
+
+Run it with the Phoenix configuration::
+
+    $ phoenix-poller /path/to/phoenix.ini
+
+Options (in the ``[app:main]`` section):
+
+* ``phoenix.poller.max_per_host``: parallel status requests per WPS host (default: 4).
+* ``phoenix.poller.batch_size``: number of due jobs fetched at once (default: 500).
+* ``phoenix.poller.interval``: seconds between database scans (default: 1).
+* ``phoenix.poller.workers``: threads used for blocking http/database calls (default: 20).
+"""
+
+import argparse
+import asyncio
+import random
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from phoenix.db import mongodb
+from phoenix.events import JobFinished
+from phoenix.tasks.utils import save_log, update_job, wait_secs
+from phoenix.tasks.utils import snapshot, save_job, status_changed
+from phoenix.wps import check_status, RUNNING
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+MAX_RETRIES = 5
+# saved on each poll to reschedule the job
+POLL_FIELDS = ('poll_at', 'poll_step', 'poll_retries')
+
+
+def retry_secs(num_retries):
+    """Exponential backoff with jitter used after failed status requests."""
+    return min(60, 2 ** num_retries) + random.uniform(0, 1)
+
+
+class StatusPoller(object):
+    def __init__(self, registry):
+        self.registry = registry
+        settings = registry.settings
+        self.max_per_host = int(settings.get('phoenix.poller.max_per_host', '4'))
+        self.batch_size = int(settings.get('phoenix.poller.batch_size', '500'))
+        self.interval = float(settings.get('phoenix.poller.interval', '1'))
+        self.executor = ThreadPoolExecutor(max_workers=int(settings.get('phoenix.poller.workers', '20')))
+        self.collection = mongodb(registry).jobs
+        self.semaphores = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        # jobs currently polled: identifier -> future
+        self.in_flight = {}
+
+    def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+    def due_jobs(self):
+        search_filter = {
+            'status': {'$in': RUNNING},
+            'poll_at': {'$lte': datetime.now()},
+            'identifier': {'$nin': list(self.in_flight)},
+        }
+        return list(self.collection.find(search_filter).sort('poll_at', 1).limit(self.batch_size))
+
+    def save(self, job, stored, fields=None):
+        save_job(self.collection, job, stored, fields)
+
+    async def run(self):
+        LOGGER.info("status poller started.")
+        while True:
+            try:
+                jobs = await self._call(self.due_jobs)
+            except Exception:
+                LOGGER.exception("could not fetch jobs to poll.")
+                jobs = []
+            for job in jobs:
+                future = asyncio.ensure_future(self.poll(job))
+                self.in_flight[job['identifier']] = future
+                future.add_done_callback(
+                    lambda _, identifier=job['identifier']: self.in_flight.pop(identifier, None))
+            await asyncio.sleep(self.interval)
+
+    async def poll(self, job):
+        host = urlparse(job.get('status_location') or '').netloc
+        stored = snapshot(job)
+        try:
+            async with self.semaphores[host]:
+                execution = await self._call(
+                    check_status, url=job['status_location'], verify=False, sleep_secs=0)
+            update_job(job, execution)
+        except Exception:
+            job['poll_retries'] = job.get('poll_retries', 0) + 1
+            LOGGER.exception("Could not read status xml document for job %s.", job['identifier'])
+            if job['poll_retries'] >= MAX_RETRIES:
+                job['status'] = "ProcessFailed"
+                job['status_message'] = "Error: Could not read status document after {} retries.".format(
+                    MAX_RETRIES)
+            else:
+                job['poll_at'] = datetime.now() + timedelta(seconds=retry_secs(job['poll_retries']))
+        else:
+            job['poll_retries'] = 0
+            job['poll_step'] = job.get('poll_step', 0) + 1
+            job['poll_at'] = datetime.now() + timedelta(seconds=wait_secs(job['poll_step']))
+        finally:
+            finished = job.get('status') not in RUNNING
+            if finished:
+                job.pop('poll_at', None)
+            save_log(job)
+            # only reschedule the job if the status has not changed
+            if finished or status_changed(job, stored):
+                fields = None
+            else:
+                fields = POLL_FIELDS
+            try:
+                await self._call(self.save, job, stored, fields)
+            except Exception:
+                LOGGER.exception("could not update job %s.", job['identifier'])
+        if finished:
+            self.registry.notify(JobFinished(job, self.registry))
+
+
+def main(argv=None):
+    from pyramid.paster import bootstrap, setup_logging
+
+    parser = argparse.ArgumentParser(description="Poll the status of running WPS jobs.")
+    parser.add_argument('config_uri', help="Phoenix configuration file, e.g. phoenix.ini")
+    args = parser.parse_args(argv)
+
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+    try:
+        poller = StatusPoller(env['registry'])
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(poller.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env['closer']()
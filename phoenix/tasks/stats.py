@@ -0,0 +1,15 @@
+from pyramid_celery import celery_app as app
+
+from phoenix.db import mongodb
+from phoenix.dashboard.stats import reconcile_stats as _reconcile_stats
+
+from celery.utils.log import get_task_logger
+LOGGER = get_task_logger(__name__)
+
+
+@app.task
+def reconcile_stats():
+    """Periodic task (celery beat) which recomputes the dashboard statistics."""
+    registry = app.conf['PYRAMID_REGISTRY']
+    stats = _reconcile_stats(mongodb(registry))
+    LOGGER.info("reconciled dashboard stats: jobs=%s, users=%s", stats['jobs'], stats['users'])
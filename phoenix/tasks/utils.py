@@ -1,8 +1,13 @@
 import datetime
 import json
+from lxml import etree
+
+from pyramid.settings import asbool
 
 from phoenix.db import mongodb
 from phoenix.twitcherclient import generate_access_token
+from phoenix.wps import execution_data
+from phoenix.xmlstore import XML_FIELDS, save_xml
 
 from pyramid_celery import celery_app as app
 from celery.utils.log import get_task_logger
@@ -21,6 +26,36 @@ def wait_secs(run_step=-1):
     return secs_list[run_step]
 
 
+def use_poller(registry):
+    """Jobs are watched by the status poller service instead of the celery task."""
+    return asbool(registry.settings.get('phoenix.poller', 'false'))
+
+
+def update_job(job, execution):
+    """
+    Updates ``job`` with the status of the WPS ``execution``.
+    """
+    job['response'] = etree.tostring(execution.response)
+    job['status'] = execution.getStatus()
+    job['status_message'] = execution.statusMessage
+    job['progress'] = execution.percentCompleted
+    duration = datetime.datetime.now() - job.get('created', datetime.datetime.now())
+    job['duration'] = str(duration).split('.')[0]
+
+    if execution.isComplete():
+        job['finished'] = datetime.datetime.now()
+        # parsed once, the monitor shows them without fetching the status document
+        job.update(execution_data(execution))
+        if execution.isSucceded():
+            logger.debug("job succeded")
+            job['progress'] = 100
+        else:
+            logger.debug("job failed.")
+            job['status_message'] = '\n'.join(error.text for error in execution.errors)
+            for error in execution.errors:
+                save_log(job, error)
+
+
 def dump_json(obj):
     def date_handler(obj):
         if isinstance(obj, datetime.datetime) or isinstance(obj, datetime.date):
@@ -33,16 +68,16 @@ def dump_json(obj):
 
 def save_log(job, error=None):
     if error:
-        log_msg = 'ERROR: {0.text} - code={0.code} - locator={0.locator}'.format(error)
+        log_msg = status_msg = 'ERROR: {0.text} - code={0.code} - locator={0.locator}'.format(error)
     else:
-        log_msg = '{0} {1:3d}%: {2}'.format(
-            job.get('duration', 0),
+        status_msg = '{0:3d}%: {1}'.format(
             job.get('progress', 0),
             job.get('status_message', 'no message'))
+        log_msg = '{0} {1}'.format(job.get('duration', 0), status_msg)
     if 'log' not in job:
         job['log'] = []
-    # skip same log messages
-    if len(job['log']) == 0 or job['log'][-1] != log_msg:
+    # skip same log messages, a new duration alone is not logged
+    if len(job['log']) == 0 or not job['log'][-1].endswith(status_msg):
         job['log'].append(log_msg)
         if error:
             logger.error(log_msg)
@@ -50,6 +85,72 @@ def save_log(job, error=None):
             logger.info(log_msg)
 
 
+STATUS_FIELDS = ('status', 'progress', 'status_message')
+
+
+def snapshot(job):
+    """Returns a copy of ``job`` to track later changes."""
+    stored = dict(job)
+    stored['log'] = list(job.get('log', []))
+    return stored
+
+
+def status_changed(job, stored):
+    """Returns True if status, progress or status message of ``job`` changed since ``stored``."""
+    return any(job.get(key) != stored.get(key) for key in STATUS_FIELDS)
+
+
+def job_update(job, stored, fields=None):
+    """
+    Returns the mongodb update document for the changes of ``job`` since ``stored``.
+    New log entries are appended with ``$push``. Only ``fields`` are compared if given.
+    XML documents are not part of the job document (see ``save_job``).
+    """
+    keys = fields or set(job) | set(stored)
+    update = {}
+    for key in keys:
+        if key in ('_id', 'log') or key in XML_FIELDS:
+            continue
+        if key not in job:
+            if key in stored:
+                update.setdefault('$unset', {})[key] = ''
+        elif key not in stored or stored[key] != job[key]:
+            update.setdefault('$set', {})[key] = job[key]
+    if fields is None or 'log' in fields:
+        log = job.get('log', [])
+        stored_log = stored.get('log', [])
+        if log != stored_log:
+            if log[:len(stored_log)] == stored_log:
+                update['$push'] = {'log': {'$each': log[len(stored_log):]}}
+            else:
+                update.setdefault('$set', {})['log'] = log
+    return update
+
+
+def save_job(collection, job, stored, fields=None):
+    """
+    Writes the changes of ``job`` since the ``stored`` snapshot to the database.
+    Changed request/response documents go to the compressed XML store.
+    Returns the new snapshot.
+    """
+    update = job_update(job, stored, fields)
+    if update:
+        collection.update_one({'identifier': job['identifier']}, update)
+    documents = dict((key, job[key]) for key in XML_FIELDS
+                     if key in job and (fields is None or key in fields) and job[key] != stored.get(key))
+    if documents:
+        save_xml(collection.database, job['identifier'], **documents)
+    if fields is None:
+        return snapshot(job)
+    stored = snapshot(stored)
+    for key in fields:
+        if key in job:
+            stored[key] = list(job[key]) if key == 'log' else job[key]
+        else:
+            stored.pop(key, None)
+    return stored
+
+
 def add_job(db, task_id, process_id, title=None, abstract=None,
             service_name=None, service=None, status_location=None,
             caption=None, userid=None,
@@ -73,8 +174,6 @@ def add_job(db, task_id, process_id, title=None, abstract=None,
         tags=tags,
         caption=caption,
         status="ProcessAccepted",
-        response=None,
-        request=None,
     )
     db.jobs.insert(job)
     return job
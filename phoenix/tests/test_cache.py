@@ -0,0 +1,74 @@
+import pytest
+
+from pyramid import testing
+
+from phoenix.cache import TTLCache, cache_factory, cache_stats
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_or_create():
+    cache = TTLCache(ttl=10)
+    assert cache.get_or_create('a', lambda: 1) == 1
+    assert cache.get_or_create('a', lambda: 2) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_expires():
+    timer = FakeTimer()
+    cache = TTLCache(ttl=10, timer=timer)
+    cache.set('a', 1)
+    assert 'a' in cache
+    timer.now = 11
+    assert 'a' not in cache
+    assert cache.get('a') is None
+
+
+def test_max_size():
+    cache = TTLCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+
+def test_errors_are_not_cached():
+    cache = TTLCache()
+
+    def fail():
+        raise ValueError()
+    with pytest.raises(ValueError):
+        cache.get_or_create('a', fail)
+    assert 'a' not in cache
+
+
+def test_invalidate():
+    cache = TTLCache()
+    cache.set(('emu', None), 1)
+    cache.set(('emu', 'hello'), 2)
+    cache.set(('hummingbird', None), 3)
+    cache.invalidate_matching(lambda key: key[0] == 'emu')
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_cache_factory():
+    registry = testing.setUp(settings={'phoenix.cache.wps.ttl': '60'}).registry
+    try:
+        cache = cache_factory(registry, 'wps', ttl=600)
+        assert cache.ttl == 60
+        assert cache_factory(registry, 'wps') is cache
+        assert cache_stats(registry)['wps']['size'] == 0
+    finally:
+        testing.tearDown()
@@ -2,7 +2,8 @@ import pytest
 import unittest
 from pyramid import testing
 
-from phoenix.cart import Cart
+from phoenix.cart import Cart, CartItem
+from phoenix.cart.cart import MongodbCartStore, url_hash
 
 
 def test_cart():
@@ -19,6 +20,8 @@ def test_cart():
         assert item.url == url
 
     assert url in cart
+    assert None not in cart
+    assert '' not in cart
 
     cart.remove_item(url)
     assert cart.has_items() is False
@@ -34,6 +37,85 @@ def test_clear_cart():
     assert cart.count() == 0
 
 
+class DummyCursor(list):
+    def sort(self, key, direction):
+        return DummyCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, num):
+        return DummyCursor(self[:num] if num else self)
+
+
+class DummyCollection(object):
+    def __init__(self):
+        self.docs = []
+        self.queries = 0
+
+    def _match(self, doc, spec):
+        for key, value in spec.items():
+            if isinstance(value, dict):
+                if doc.get(key) not in value['$in']:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    def find(self, spec, projection=None):
+        self.queries += 1
+        return DummyCursor(dict(doc) for doc in self.docs if self._match(doc, spec))
+
+    def update_one(self, spec, update, upsert=False):
+        for doc in self.docs:
+            if self._match(doc, spec):
+                doc.update(update['$set'])
+                return
+        doc = dict(spec)
+        doc.update(update['$set'])
+        doc.update(update['$setOnInsert'])
+        self.docs.append(doc)
+
+    def find_one_and_delete(self, spec):
+        for doc in self.docs:
+            if self._match(doc, spec):
+                self.docs.remove(doc)
+                return doc
+        return None
+
+    def delete_many(self, spec):
+        self.docs = [doc for doc in self.docs if not self._match(doc, spec)]
+
+
+def test_mongodb_cart():
+    collection = DummyCollection()
+    request = testing.DummyRequest()
+    cart = Cart(request, store=MongodbCartStore(collection, 'alice'))
+    url = "http://localhost/download/test.nc"
+    cart.add_item(url=url, title="Test")
+    cart.add_item(url="http://localhost/opendap/test.nc", mime_type='application/x-ogc-dods')
+    cart.add_item(url=url, title="Test again")
+    assert cart.count() == 2
+    assert collection.docs[0]['url_hash'] == url_hash(url)
+    assert collection.docs[0]['title'] == "Test again"
+    # membership is checked with one query
+    assert url in cart
+    assert "http://localhost/other.nc" not in cart
+    assert cart.has_items()
+    assert collection.queries == 1
+    assert [item.url for item in cart.items(mime_types=['application/x-ogc-dods'])] == [
+        "http://localhost/opendap/test.nc"]
+    assert cart.remove_item(url).title == "Test again"
+    assert url not in cart
+    assert cart.count() == 1
+    assert Cart(request, store=MongodbCartStore(collection, 'bob')).count() == 0
+    cart.clear()
+    assert cart.count() == 0
+
+
+def test_cart_item_slots():
+    item = CartItem("http://localhost/download/test.nc")
+    assert not hasattr(item, '__dict__')
+    assert item.title == 'test.nc'
+
+
 class CartTests(unittest.TestCase):
     def setUp(self):
         self.config = testing.setUp()
@@ -1,7 +1,49 @@
-from phoenix.catalog import doc2record
+from phoenix.catalog import doc2record, MongodbCatalog
 
 
 def test_doc2record():
     record = doc2record({'_id': '123', 'title': 'test doc'})
     assert record.title == 'test doc'
     assert doc2record(None) is None
+
+
+class DummyCollection(object):
+    def __init__(self, docs=None):
+        self.docs = docs or []
+        self.queries = 0
+
+    def find(self, spec):
+        self.queries += 1
+        return [dict(doc) for doc in self.docs if doc['type'] == spec['type']]
+
+    def find_one(self, spec):
+        self.queries += 1
+        return self.docs[0] if self.docs else None
+
+    def update_one(self, spec, update, upsert=False):
+        if not self.docs:
+            self.docs.append(dict(spec, version=0))
+        self.docs[0]['version'] += update['$inc']['version']
+
+
+class DummyDatabase(object):
+    def __init__(self):
+        self.catalog_version = DummyCollection()
+
+
+def test_catalog_snapshot():
+    now = [0]
+    collection = DummyCollection([
+        dict(type='service', format='WPS', title='emu'),
+        dict(type='service', format='THREDDS', title='tds')])
+    collection.database = DummyDatabase()
+    catalog = MongodbCatalog(collection, service_registry=None, poll_interval=5, timer=lambda: now[0])
+    assert [record.title for record in catalog.get_services(service_type='WPS')] == ['emu']
+    assert len(catalog.get_services()) == 2
+    assert collection.queries == 1
+    # changes made by another process are seen after the poll interval
+    collection.docs.append(dict(type='service', format='WPS', title='hummingbird'))
+    MongodbCatalog(collection, service_registry=None)._changed()
+    assert len(catalog.get_services(service_type='WPS')) == 1
+    now[0] = 10
+    assert len(catalog.get_services(service_type='WPS')) == 2
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from phoenix.dashboard import stats
+
+
+def test_logged_in():
+    now = datetime(2018, 10, 18, 12)
+    doc = {'logins': {}}
+    for hours, userid in [(1, 'a'), (2, 'a'), (5, 'b'), (30, 'c'), (100, 'b'), (200, 'd')]:
+        bucket = (now - timedelta(hours=hours)).strftime(stats.BUCKET_FORMAT)
+        doc['logins'].setdefault(bucket, []).append(userid)
+    assert stats.logged_in(doc, now - timedelta(hours=24)) == 2
+    assert stats.logged_in(doc, now - timedelta(days=7)) == 3
+    assert stats.logged_in({}, now) == 0
+
+
+class DummyStats(object):
+    def __init__(self, doc):
+        self.doc = doc
+        self.updates = []
+
+    def find_one_and_update(self, spec, update, projection=None, upsert=False):
+        before = {'logins': dict(self.doc['logins'])}
+        for key, userid in update['$addToSet'].items():
+            self.doc['logins'].setdefault(key.split('.', 1)[1], []).append(userid)
+        return before
+
+    def update_one(self, spec, update, upsert=False):
+        self.updates.append(update)
+        for key in update.get('$unset', {}):
+            del self.doc['logins'][key.split('.', 1)[1]]
+
+
+def test_user_logged_in():
+    now = datetime(2018, 10, 18, 12)
+    db = type('DummyDB', (object,), {})()
+    db.stats = DummyStats({'logins': {'2018101811': ['a'], '2018101111': ['b'], '2018100112': ['c']}})
+    stats.user_logged_in(db, 'd', now=now)
+    assert sorted(db.stats.doc['logins']) == ['2018101811', '2018101812']
+    assert db.stats.updates == [{'$unset': {'logins.2018101111': '', 'logins.2018100112': ''}}]
+    stats.user_logged_in(db, 'a', now=now)
+    assert len(db.stats.updates) == 1
+
+
+class DummyJobs(object):
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def find_one_and_update(self, spec, update, projection=None):
+        for job in self.jobs:
+            if job['identifier'] == spec['identifier'] and not job.get('stats_counted'):
+                job.update(update['$set'])
+                return {'_id': job['identifier']}
+        return None
+
+
+def test_job_finished():
+    db = type('DummyDB', (object,), {})()
+    db.jobs = DummyJobs([{'identifier': 'a'}])
+    db.stats = DummyStats({'logins': {}})
+    assert stats.job_finished(db, {'identifier': 'a', 'status': 'ProcessSucceeded'}) is True
+    assert db.stats.updates == [{'$inc': {'jobs.running': -1, 'jobs.succeeded': 1}}]
+    # counted once
+    assert stats.job_finished(db, {'identifier': 'a', 'status': 'ProcessSucceeded'}) is False
+    # deleted while running
+    assert stats.job_finished(db, {'identifier': 'b', 'status': 'ProcessFailed'}) is False
+    assert len(db.stats.updates) == 1
+
+
+def test_user_counters():
+    db = type('DummyDB', (object,), {})()
+    db.stats = DummyStats({'logins': {}})
+    stats.user_added(db)
+    stats.user_group_changed(db, stats.Guest, 'user')
+    stats.user_group_changed(db, 'user', 'admin')
+    stats.user_removed(db, 'admin')
+    assert db.stats.updates == [
+        {'$inc': {'users.total': 1, 'users.not_activated': 1}},
+        {'$inc': {'users.not_activated': -1}},
+        {'$inc': {'users.total': -1}}]
+
+
+def test_load_stats_claims_recompute(monkeypatch):
+    now = datetime(2018, 10, 18, 12)
+    reconciled = now - timedelta(minutes=stats.RECONCILE_MINUTES + 1)
+    claims = []
+
+    class Stats(object):
+        def find_one(self, spec):
+            return {'_id': stats.STATS_ID, 'reconciled': reconciled, 'jobs': {}}
+
+        def find_one_and_update(self, spec, update, projection=None):
+            claims.append(spec)
+            # only the first request claims the recompute
+            return {'_id': stats.STATS_ID} if len(claims) == 1 else None
+    db = type('DummyDB', (object,), {})()
+    db.stats = Stats()
+    recomputed = []
+    monkeypatch.setattr(stats, 'reconcile_stats', lambda db, now: recomputed.append(now) or {'reconciled': now})
+    assert stats.load_stats(db, now=now) == {'reconciled': now}
+    assert stats.load_stats(db, now=now)['reconciled'] == reconciled
+    assert recomputed == [now]
+    assert claims[0] == {'_id': stats.STATS_ID, 'reconciled': reconciled}
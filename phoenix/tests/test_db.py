@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from phoenix import db as phoenix_db
+
+
+class DummyCollection(object):
+    def __init__(self, name):
+        self.name = name
+        self.indexes = {'_id_': {'key': [('_id', 1)]}}
+
+    def index_information(self):
+        return self.indexes
+
+    def create_index(self, keys, **kwargs):
+        name = '_'.join('{}_{}'.format(*key) for key in keys)
+        self.indexes[name] = {'key': keys}
+        return name
+
+
+class DummyDB(dict):
+    def __missing__(self, name):
+        self[name] = DummyCollection(name)
+        return self[name]
+
+
+def test_ensure_indexes():
+    db = DummyDB()
+    missing = phoenix_db.verify_indexes(db)
+    assert len(missing) == sum(len(indexes) for indexes in phoenix_db.INDEXES.values())
+    created = phoenix_db.ensure_indexes(db)
+    assert 'userid_1_created_-1' in created
+    assert phoenix_db.missing_indexes(db) == []
+    assert phoenix_db.ensure_indexes(db) == []
+
+
+def test_plan_stages():
+    plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}
+    assert phoenix_db.plan_stages(plan) == ['FETCH', 'IXSCAN']
+    plan = {'stage': 'SORT', 'inputStages': [{'stage': 'COLLSCAN'}]}
+    assert phoenix_db.plan_stages(plan) == ['SORT', 'COLLSCAN']
+
+
+def test_winning_plan():
+    plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}
+    assert phoenix_db.winning_plan({'queryPlanner': {'winningPlan': plan}}) == plan
+    explained = {'stages': [{'$cursor': {'queryPlanner': {'winningPlan': plan}}}, {'$group': {}}]}
+    assert phoenix_db.winning_plan(explained) == plan
+
+
+def test_main_queries():
+    queries = phoenix_db.main_queries()
+    name, command = queries['monitor_counts']
+    assert name == 'jobs'
+    assert command['pipeline'][0] == {'$match': {'userid': ''}}
+    name, command = queries['monitor_jobs_finished']
+    assert command['filter']['status'] == {'$in': ['ProcessSucceeded', 'ProcessFailed']}
+    assert list(command['sort'].items()) == [('finished', -1)]
+    assert isinstance(queries['users_logged_in'][1]['filter']['last_login']['$gt'], datetime)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from phoenix.esgf.cache import SearchCache, search_key, esgf_cache
+
+
+class DummyCursor(list):
+    def sort(self, key, direction):
+        return DummyCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, num):
+        return DummyCursor(self[:num])
+
+
+class DummyCollection(object):
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, spec, projection=None):
+        doc = self.docs.get(spec['_id'])
+        if doc and 'expires' in spec and doc['expires'] <= spec['expires']['$gt']:
+            return None
+        return doc
+
+    def replace_one(self, spec, doc, upsert=False):
+        self.docs[spec['_id']] = dict(doc, _id=spec['_id'])
+
+    def update_one(self, spec, update, upsert=False):
+        doc = self.docs.setdefault(spec['_id'], dict(spec))
+        for key, value in update['$inc'].items():
+            doc[key] = doc.get(key, 0) + value
+
+    def count(self):
+        return len(self.docs)
+
+    def find(self, spec, projection=None):
+        return DummyCursor(self.docs.values())
+
+    def delete_many(self, spec):
+        for key in spec['_id']['$in']:
+            del self.docs[key]
+
+
+def test_search_key():
+    key = search_key('datasets', constraints=[('project', 'CMIP5'), ('variable', 'tas')], distrib=False)
+    assert key == search_key('datasets', constraints=[('variable', 'tas'), ('project', 'CMIP5')], distrib=False)
+    assert key != search_key('datasets', constraints=[('project', 'CMIP5')], distrib=False)
+    assert key != search_key('datasets', constraints=[('project', 'CMIP5'), ('variable', 'tas')], distrib=True)
+    assert key != search_key('items', constraints=[('project', 'CMIP5'), ('variable', 'tas')], distrib=False)
+    assert search_key('datasets', query=' tas ') == search_key('datasets', query='tas', start=None)
+
+
+def test_search_cache():
+    cache = SearchCache(DummyCollection(), DummyCollection(), ttl=60, max_size=2, stats_sample=1, evict_sample=1)
+    calls = []
+
+    def search():
+        calls.append(1)
+        return dict(hit_count=1, projects=[('CMIP5', 1)])
+    assert cache.get_or_search('a', search)['hit_count'] == 1
+    assert cache.get_or_search('a', search) == dict(hit_count=1, projects=[['CMIP5', 1]])
+    assert len(calls) == 1
+    cache.set('b', 2)
+    cache.collection.docs['a']['expires'] -= timedelta(seconds=30)
+    cache.set('c', 3)
+    assert sorted(cache.collection.docs) == ['b', 'c']
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 2
+
+
+def test_disabled_cache():
+    cache = SearchCache(DummyCollection(), DummyCollection(), ttl=0)
+    assert cache.get_or_search('a', lambda: 1) == 1
+    assert cache.collection.docs == {}
+
+
+def test_cache_without_db():
+    from pyramid import testing
+    request = testing.DummyRequest()
+    cache = esgf_cache(request)
+    assert cache.enabled is False
+    assert cache.get_or_search('a', lambda: 1) == 1
+    assert cache.stats()['size'] == 0
+    request.db = testing.DummyResource(esgf_cache=DummyCollection(), stats=DummyCollection())
+    request.registry.settings = {'esgfsearch.cache.ttl': '0'}
+    assert esgf_cache(request).enabled is False
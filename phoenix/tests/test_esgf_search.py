@@ -39,6 +39,87 @@ def test_variable_filter():
     assert search.variable_filter({}, {'variable': ['tas']}) is True
 
 
+def test_date_from_filename_fixed_field():
+    assert search.date_from_filename("orog_EUR-44_ECMWF-ERAINT_evaluation_r0i0p0_SMHI-RCA4_v1_fx.nc") is None
+
+
+def test_result_filter():
+    class Result(object):
+        def __init__(self, filename, variable):
+            self.filename = filename
+            self.json = {'variable': [variable]}
+    results = [
+        Result("tas_EUR-44_mon_200101-200512.nc", 'tas'),
+        Result("pr_EUR-44_mon_200101-200512.nc", 'pr'),
+        Result("tas_EUR-44_mon_199101-199512.nc", 'tas'),
+        Result("tas_EUR-44_fx.nc", 'tas')]
+    result_filter = search.ResultFilter(search.build_constraint_dict('variable:tas,variable:tasmax'), 2001, 2005)
+    assert [r.filename for r in result_filter.apply(results)] == [
+        "tas_EUR-44_mon_200101-200512.nc", "tas_EUR-44_fx.nc"]
+    assert len(list(result_filter.apply(results, temporal=False))) == 3
+
+
+@pytest.mark.slow
+def test_result_filter_benchmark(record_property):
+    import time
+
+    class Result(object):
+        def __init__(self, num):
+            year = 1950 + num % 100
+            self.filename = "tas_EUR-44_v{}_mon_{}01-{}12.nc".format(num, year, year + 4)
+            self.json = {'variable': ['tas' if num % 2 else 'pr'], 'cf_standard_name': ['air_temperature']}
+    results = [Result(num) for num in range(100000)]
+    constraints = search.build_constraint_dict('project:CORDEX,variable:tas,variable:tasmax')
+    t0 = time.time()
+    passed = list(search.ResultFilter(constraints, 2001, 2005).apply(results))
+    elapsed = time.time() - t0
+    assert len(passed) == 5000
+    record_property('filter_100k_secs', round(elapsed, 3))
+
+
+def test_search_connection_pool():
+    from phoenix.esgf.connection import search_connection
+    registry = testing.DummyResource(settings={'esgfsearch.connect_timeout': '5'})
+    conn = search_connection(registry, 'https://esgf-data.dkrz.de/esg-search')
+    assert conn.timeout == (5.0, 20.0)
+    assert search_connection(registry, 'https://esgf-data.dkrz.de/esg-search') is conn
+    assert search_connection(registry, 'https://esgf-data.dkrz.de/esg-search', distrib=True) is not conn
+    conn.open()
+    session = conn.session
+    conn.close()
+    conn.open()
+    assert conn.session is session
+    registry = testing.DummyResource(settings={'esgfsearch.timeout': '30', 'esgfsearch.read_timeout': '25'})
+    assert search_connection(registry, 'https://esgf-data.dkrz.de/esg-search').timeout == (10.0, 25.0)
+
+
+class DummyContext(object):
+    facet_counts = {'project': {'CORDEX': 10}, 'variable': {'tas': 4, 'pr': 6}}
+    hit_count = 10
+
+    def constrain(self, **constraints):
+        return self
+
+    def _build_query(self):
+        return {}
+
+
+class DummyConnection(object):
+    def __init__(self):
+        self.queries = []
+
+    def new_context(self, **kwargs):
+        return DummyContext()
+
+    def send_search(self, query_dict, limit=None, offset=None):
+        self.queries.append((limit, offset))
+        docs = [dict(id='ds{}|node'.format(num), master_id='ds{}'.format(num), title='ds{}'.format(num),
+                     number_of_files=1, size=1024,
+                     url=['http://node/ds{}.xml|application/xml+thredds|THREDDS'.format(num)])
+                for num in range(offset, min(offset + limit, 10))]
+        return {'response': {'numFound': 10, 'docs': docs}}
+
+
 class ESGFSearchTests(unittest.TestCase):
     def setUp(self):
         self.config = testing.setUp()
@@ -64,9 +145,57 @@ class ESGFSearchTests(unittest.TestCase):
         assert params['start'].year == 2001
         assert params['end'].year == 2005
 
+    def test_limit(self):
+        request = testing.DummyRequest(params={'limit': '1000000'})
+        esgfsearch = ESGFSearch(request, url='https://esgf-data.dkrz.de/esg-search')
+        assert esgfsearch.limit == search.MAX_PAGE_SIZE
+
+    def test_search_items_partial(self):
+        import time
+        request = testing.DummyRequest(params={'dataset_id': 'cordex.test'})
+        request.registry.settings = {'esgfsearch.timeout': '0.5'}
+        setattr(request, 'cart', {})
+        esgfsearch = ESGFSearch(request, url='https://esgf-data.dkrz.de/esg-search')
+
+        def run_search_items(dataset_id, search_type):
+            if search_type == search.TYPE_FILE:
+                time.sleep(2)
+            return [dict(title=search_type, opendap_url=None)]
+        esgfsearch._run_search_items = run_search_items
+        result = esgfsearch.search_items()
+        assert result['partial'] is True
+        assert [item['title'] for item in result['items']] == [search.TYPE_AGGREGATION]
+
+    def test_search_datasets_modes(self):
+        request = testing.DummyRequest(params={'selected': 'variable'})
+        request.registry.settings = {'esgfsearch.cache.ttl': '0'}
+        request.db = testing.DummyResource(esgf_cache=None, stats=None)
+        setattr(request, 'cart', {})
+        esgfsearch = ESGFSearch(request, url='https://esgf-data.dkrz.de/esg-search')
+        esgfsearch.conn = DummyConnection()
+        # facets only
+        result = esgfsearch.search_datasets(limit=0)
+        assert result['keywords'] == 'pr,tas'
+        assert result['hit_count'] == 10
+        assert 'results' not in result
+        assert esgfsearch.conn.queries == []
+        # results only
+        result = esgfsearch.search_datasets(facets=False, offset=5, limit=3)
+        assert 'keywords' not in result
+        assert [item['title'] for item in result['results']] == ['ds5', 'ds6', 'ds7']
+        assert result['results'][0]['catalog_url'] == 'http://node/ds5.xml'
+        assert esgfsearch.conn.queries == [(3, 5)]
+        # both
+        result = esgfsearch.search_datasets()
+        assert result['categories'] == 'variable'
+        assert result['pinned_keywords'] == 'project:CORDEX'
+        assert len(result['results']) == search.PAGE_SIZE
+
     @pytest.mark.online
     def test_search_datasets(self):
         request = testing.DummyRequest()
+        request.registry.settings = {'esgfsearch.cache.ttl': '0'}
+        setattr(request, 'cart', {})
         esgfsearch = ESGFSearch(request, url='https://esgf-data.dkrz.de/esg-search')
         result = esgfsearch.search_datasets()
         assert len(result['projects'])
@@ -79,6 +208,7 @@ class ESGFSearchTests(unittest.TestCase):
                 'dataset_id':
                 'cordex.output.EUR-44.MPI-CSC.MPI-M-MPI-ESM-LR.historical.r1i1p1.REMO2009.v1.mon.tas.v20150609|esgf1.dkrz.de',  # noqa
             })
+        request.registry.settings = {'esgfsearch.cache.ttl': '0'}
         setattr(request, 'cart', {})
         esgfsearch = ESGFSearch(request, url='https://esgf-data.dkrz.de/esg-search')
         result = esgfsearch.search_items()
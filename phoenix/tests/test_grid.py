@@ -0,0 +1,43 @@
+from pyramid import testing
+
+from phoenix.grid import CustomGrid
+from phoenix.security import UserLabels
+
+
+class DummyUsers(object):
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    def find(self, spec, projection=None):
+        self.queries.append(spec)
+        return [user for user in self.users if user['identifier'] in spec['identifier']['$in']]
+
+
+def dummy_request():
+    request = testing.DummyRequest()
+    request.db = testing.DummyResource(users=DummyUsers([
+        dict(identifier='1', login_id='alice', name='Alice'),
+        dict(identifier='2', login_id='bob', name='Bob')]))
+    request.user_labels = UserLabels(request)
+    return request
+
+
+def test_user_labels():
+    request = dummy_request()
+    assert request.user_labels.label('1') == 'Alice'
+    assert request.user_labels.label('1', 'login_id') == 'alice'
+    assert request.user_labels.label('3') == 'Unknown'
+    assert request.user_labels.label(None) == 'Unknown'
+    assert len(request.db.users.queries) == 2
+
+
+def test_grid_prefetches_users():
+    request = dummy_request()
+    items = [dict(userid=userid) for userid in ['1', '2', '1', '3'] * 25]
+    grid = CustomGrid(request, items, ['user'], url=lambda **kw: '/')
+    grid.column_formats['user'] = grid.user_td('userid')
+    grid.exclude_ordering = grid.columns
+    html = grid.__html__()
+    assert 'Alice' in html and 'Bob' in html and 'Unknown' in html
+    assert len(request.db.users.queries) == 1
@@ -0,0 +1,79 @@
+import os
+import time
+import datetime
+
+import pytest
+
+from phoenix.monitor.queries import jobs_filter, counts_pipeline, count_jobs, JOB_PROJECTION
+
+
+def test_jobs_filter():
+    assert jobs_filter({'userid': 'alice'}, status='Running') == {
+        'userid': 'alice', 'status': {'$in': ['ProcessAccepted', 'ProcessPaused', 'ProcessStarted']}}
+    assert jobs_filter({'userid': 'alice'}, status='ProcessFailed') == {'userid': 'alice', 'status': 'ProcessFailed'}
+    assert jobs_filter({}) == {}
+    assert JOB_PROJECTION['response'] == 0
+    assert JOB_PROJECTION['log'] == 0
+
+
+def test_counts_pipeline():
+    pipeline = counts_pipeline({'userid': 'alice'})
+    assert pipeline[0] == {'$match': {'userid': 'alice'}}
+    assert pipeline[1] == {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+
+
+def test_count_jobs():
+    counts = {'ProcessSucceeded': 5, 'ProcessFailed': 2, 'ProcessStarted': 3, 'ProcessAccepted': 1}
+    assert count_jobs(counts) == 11
+    assert count_jobs(counts, 'Running') == 4
+    assert count_jobs(counts, 'Finished') == 7
+    assert count_jobs(counts, 'ProcessFailed') == 2
+    assert count_jobs(counts, 'ProcessPaused') == 0
+
+
+@pytest.mark.slow
+def test_jobs_query_benchmark(record_property):
+    """
+    Runs the monitor queries of a user and of the admin view of all jobs over 1M jobs
+    and records their durations as test properties.
+    Needs a MongoDB given by PHOENIX_TEST_MONGODB, e.g. ``mongodb://localhost:27017``.
+    """
+    url = os.environ.get('PHOENIX_TEST_MONGODB')
+    if not url:
+        pytest.skip("PHOENIX_TEST_MONGODB is not set")
+    import pymongo
+    from phoenix.db import INDEXES
+    client = pymongo.MongoClient(url)
+    collection = client.phoenix_benchmark.jobs
+    collection.drop()
+    statuses = ['ProcessSucceeded', 'ProcessFailed', 'ProcessStarted', 'ProcessAccepted']
+    now = datetime.datetime.now()
+    for start in range(0, 1000000, 10000):
+        collection.insert_many([
+            dict(identifier=str(num), userid='user{}'.format(num % 100), status=statuses[num % 4],
+                 created=now - datetime.timedelta(seconds=num), tags=['dev'], log=['x' * 100] * 2)
+            for num in range(start, start + 10000)])
+    for keys, options in INDEXES['jobs']:
+        collection.create_index(keys, **options)
+
+    def query(search_filter, status):
+        t0 = time.time()
+        items = list(collection.find(jobs_filter(search_filter, status), JOB_PROJECTION)
+                     .sort([('created', -1)]).skip(50).limit(10))
+        counts = dict((group['_id'], group['count']) for group in collection.aggregate(counts_pipeline(search_filter)))
+        return items, counts, time.time() - t0
+
+    try:
+        items, counts, elapsed = query({'userid': 'user1'}, 'Finished')
+        assert len(items) == 10
+        assert 'log' not in items[0]
+        assert count_jobs(counts) == 10000
+        assert count_jobs(counts, 'Finished') == 5000
+        record_property('user_query_secs', round(elapsed, 3))
+        # admin view of all jobs, sorted without status filter
+        items, counts, elapsed = query({}, None)
+        assert [item['identifier'] for item in items] == [str(num) for num in range(50, 60)]
+        assert count_jobs(counts) == 1000000
+        record_property('all_jobs_query_secs', round(elapsed, 3))
+    finally:
+        client.drop_database('phoenix_benchmark')
@@ -0,0 +1,40 @@
+from pyramid import testing
+
+from phoenix import security
+from phoenix.events import UserChanged
+
+
+class DummyUsers(object):
+    def __init__(self):
+        self.users = {'1': dict(identifier='1', group=security.Admin)}
+        self.queries = 0
+
+    def find_one(self, spec, projection=None):
+        self.queries += 1
+        return self.users.get(spec['identifier'])
+
+
+def test_groupfinder():
+    config = testing.setUp()
+    try:
+        users = DummyUsers()
+        request = testing.DummyRequest()
+        request.db = testing.DummyResource(users=users)
+        assert security.groupfinder('1', request) == [security.Admin]
+        assert security.groupfinder('1', request) == [security.Admin]
+        assert security.groupfinder('2', request) == [security.Guest]
+        assert users.queries == 2
+        # cached for other requests
+        request = testing.DummyRequest()
+        request.db = testing.DummyResource(users=users)
+        assert security.groupfinder('1', request) == [security.Admin]
+        assert users.queries == 2
+        # changed users are loaded again
+        users.users['1']['group'] = security.User
+        security.invalidate_group_cache(UserChanged(config.registry, '1'))
+        request = testing.DummyRequest()
+        request.db = testing.DummyResource(users=users)
+        assert security.groupfinder('1', request) == [security.User]
+        assert users.queries == 3
+    finally:
+        testing.tearDown()
@@ -0,0 +1,371 @@
+import io
+import os
+import time
+import shutil
+import tracemalloc
+from cgi import FieldStorage
+from urllib.parse import urlencode
+
+import pytest
+from pyramid import testing
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.request import Request
+from pyramid_storage.local import LocalFileStorage
+
+from phoenix.storage.utils import copy_file, FileSizeLimitExceeded
+from phoenix.storage.dedup import link_blob, collect_blobs, blob_path
+from phoenix.storage.download import parse_ranges
+from phoenix.storage.views import handle_upload, handle_delete, received_parts, combine_chunks, save_chunk
+from phoenix.storage.views import parts, upload, download
+
+
+def dummy_field(data):
+    fs = FieldStorage.__new__(FieldStorage)
+    fs.file = io.BytesIO(data)
+    return fs
+
+
+def dummy_request(tmpdir, **kwargs):
+    request = testing.DummyRequest(**kwargs)
+    request.storage = LocalFileStorage(str(tmpdir), extensions='nc')
+    request.max_file_size = 1
+    return request
+
+
+def test_copy_file(tmpdir):
+    source = tmpdir.join('source')
+    source.write_binary(b'0123456789' * 1000)
+    with open(str(source), 'rb') as fp, open(str(tmpdir.join('dest')), 'wb', buffering=0) as dest:
+        fp.seek(10)
+        assert copy_file(fp, dest) == 9990
+        assert copy_file(io.BytesIO(b'abc'), dest) == 3
+        fp.seek(0)
+        with pytest.raises(FileSizeLimitExceeded):
+            copy_file(fp, dest, max_size=9999)
+    assert tmpdir.join('dest').read_binary() == b'0123456789' * 999 + b'abc'
+
+
+def test_chunked_upload_any_order(tmpdir):
+    request = dummy_request(tmpdir)
+    chunks = [b'aaaa', b'bbbb', b'cc']
+    filename = None
+    for index in (2, 0, 1):
+        assert filename is None
+        filename = handle_upload(request, dict(
+            qqfile=dummy_field(chunks[index]), qqfilename='tas.nc', qquuid='1234',
+            qqtotalparts='3', qqpartindex=str(index), qqchunksize=str(len(chunks[index])),
+            qqtotalfilesize='10'))
+    assert filename == '1234/tas.nc'
+    assert tmpdir.join('1234', 'tas.nc').read_binary() == b'aaaabbbbcc'
+    assert not tmpdir.join('chunks', '1234').exists()
+
+
+def test_combine_failure(tmpdir, monkeypatch):
+    from phoenix.storage import views
+    request = dummy_request(tmpdir)
+
+    def upload_part(index):
+        return handle_upload(request, dict(
+            qqfile=dummy_field(b'ab'[index:index + 1]), qqfilename='tas.nc', qquuid='1234',
+            qqtotalparts='2', qqpartindex=str(index), qqchunksize='1'))
+
+    def failing_combine(total_parts, source_folder, dest, max_size=None):
+        raise IOError("disk full")
+    assert upload_part(0) is None
+    monkeypatch.setattr(views, 'combine_chunks', failing_combine)
+    with pytest.raises(IOError):
+        upload_part(1)
+    # the retry of the last part combines the parts
+    monkeypatch.setattr(views, 'combine_chunks', combine_chunks)
+    assert upload_part(1) == '1234/tas.nc'
+    assert tmpdir.join('1234', 'tas.nc').read_binary() == b'ab'
+
+
+def test_combine_locked(tmpdir):
+    request = dummy_request(tmpdir)
+    handle_upload(request, dict(
+        qqfile=dummy_field(b'a'), qqfilename='tas.nc', qquuid='1234',
+        qqtotalparts='2', qqpartindex='0', qqchunksize='1'))
+    # another request combines the parts
+    tmpdir.join('chunks', '1234', 'combining').write('')
+    with pytest.raises(Exception, match='being combined'):
+        handle_upload(request, dict(
+            qqfile=dummy_field(b'b'), qqfilename='tas.nc', qquuid='1234',
+            qqtotalparts='2', qqpartindex='1', qqchunksize='1'))
+    assert not tmpdir.join('1234').exists()
+
+
+def test_chunked_upload_too_large(tmpdir):
+    request = dummy_request(tmpdir)
+    chunk = b'a' * 400000
+
+    def upload_part(index, data=chunk):
+        return handle_upload(request, dict(
+            qqfile=dummy_field(data), qqfilename='tas.nc', qquuid='1234',
+            qqtotalparts='4', qqpartindex=str(index), qqtotalfilesize='10'))
+    # the declared total size is small, the received parts are counted
+    assert upload_part(0) is None
+    assert upload_part(1) is None
+    with pytest.raises(FileSizeLimitExceeded):
+        upload_part(2)
+    assert not tmpdir.join('chunks', '1234').exists()
+
+
+def test_combine_too_large(tmpdir):
+    parts_folder = tmpdir.join('chunks', 'parts')
+    for index, data in enumerate([b'aaaa', b'bbbb']):
+        with io.BytesIO(data) as fp:
+            save_chunk(fp, str(parts_folder.join(str(index))), max_size=4)
+    with pytest.raises(FileSizeLimitExceeded):
+        combine_chunks(2, str(parts_folder), str(tmpdir.join('upload', 'data.nc')), max_size=6)
+    assert not tmpdir.join('upload', 'data.nc').exists()
+    with pytest.raises(FileSizeLimitExceeded):
+        with io.BytesIO(b'ccccc') as fp:
+            save_chunk(fp, str(parts_folder.join('2')), max_size=4)
+    assert not parts_folder.join('2').exists()
+
+
+def test_upload_parts(tmpdir):
+    request = dummy_request(tmpdir)
+    handle_upload(request, dict(
+        qqfile=dummy_field(b'bbbb'), qqfilename='tas.nc', qquuid='1234',
+        qqtotalparts='3', qqpartindex='1', qqchunksize='4', qqtotalfilesize='10'))
+    request.matchdict = {'uuid': '1234'}
+    result = parts(request)
+    assert result['parts'] == [1]
+    assert result['total_parts'] == 3
+    assert result['filename'] == 'tas.nc'
+    request.matchdict = {'uuid': 'unknown'}
+    assert parts(request)['success'] is False
+
+
+def test_incomplete_chunk(tmpdir):
+    request = dummy_request(tmpdir)
+    with pytest.raises(Exception):
+        handle_upload(request, dict(
+            qqfile=dummy_field(b'bb'), qqfilename='tas.nc', qquuid='1234',
+            qqtotalparts='3', qqpartindex='1', qqchunksize='4'))
+    assert received_parts(str(tmpdir.join('chunks', '1234'))) == []
+
+
+def test_single_part_upload(tmpdir):
+    request = dummy_request(tmpdir)
+    filename = handle_upload(request, dict(qqfile=dummy_field(b'abc'), qqfilename='tas.nc', qquuid='1234'))
+    assert filename == '1234/tas.nc'
+    assert tmpdir.join('1234', 'tas.nc').read_binary() == b'abc'
+    assert tmpdir.join('1234', 'tas.nc.sha256').read() == \
+        'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad  tas.nc\n'
+    # name clash
+    filename = handle_upload(request, dict(qqfile=dummy_field(b'abc'), qqfilename='tas.nc', qquuid='1234'))
+    assert filename == '1234/tas-1.nc'
+
+
+def test_single_part_upload_too_large(tmpdir):
+    request = dummy_request(tmpdir)
+    with pytest.raises(FileSizeLimitExceeded):
+        handle_upload(request, dict(qqfile=dummy_field(b'a' * (1024 ** 2 + 1)), qqfilename='tas.nc', qquuid='1234'))
+    assert tmpdir.join('1234').listdir() == []
+
+
+def test_upload_request_body(tmpdir):
+    request = Request.blank(
+        '/upload?qqfile=tas.nc&qqfilename=tas.nc&qquuid=1234', method='POST', body=b'abc',
+        content_type='application/octet-stream')
+    request.registry = testing.DummyResource(settings={})
+    request.storage = LocalFileStorage(str(tmpdir), extensions='nc')
+    request.max_file_size = 1
+    assert upload(request) == {'success': True, 'filename': '1234/tas.nc'}
+    assert tmpdir.join('1234', 'tas.nc').read_binary() == b'abc'
+    request = Request.blank(
+        '/upload?qqfile=tas.nc&qqfilename=tas.nc&qquuid=1234', method='POST', body=b'a' * (2 * 1024 ** 2),
+        content_type='application/octet-stream')
+    request.max_file_size = 1
+    result = upload(request)
+    assert result['success'] is False
+    assert result['preventRetry'] is True
+
+
+def test_chunked_upload_request_body(tmpdir):
+    """Parameters as sent by Fine Uploader with ``paramsInBody: false``."""
+    results = []
+    for index, chunk in enumerate([b'aaaa', b'bb']):
+        request = Request.blank(
+            '/upload?' + urlencode(dict(
+                qqpartindex=index, qqpartbyteoffset=index * 4, qqchunksize=len(chunk), qqtotalparts=2,
+                qqtotalfilesize=6, qquuid='1234', qqfilename='tas.nc', qqfile='tas.nc')),
+            method='POST', body=chunk, content_type='application/octet-stream')
+        request.registry = testing.DummyResource(settings={})
+        request.storage = LocalFileStorage(str(tmpdir), extensions='nc')
+        request.max_file_size = 1
+        results.append(upload(request))
+    assert results == [{'success': True}, {'success': True, 'filename': '1234/tas.nc'}]
+    assert tmpdir.join('1234', 'tas.nc').read_binary() == b'aaaabb'
+
+
+def test_link_blob(tmpdir):
+    tmpdir.join('a.nc').write_binary(b'abc')
+    tmpdir.join('b.nc').write_binary(b'abc')
+    hexdigest = link_blob(str(tmpdir), str(tmpdir.join('a.nc')))
+    assert link_blob(str(tmpdir), str(tmpdir.join('b.nc'))) == hexdigest
+    assert os.path.samefile(str(tmpdir.join('a.nc')), str(tmpdir.join('b.nc')))
+    assert os.stat(blob_path(str(tmpdir), hexdigest)).st_nlink == 3
+    tmpdir.join('a.nc').remove()
+    assert collect_blobs(str(tmpdir)) == 0
+    tmpdir.join('b.nc').remove()
+    assert collect_blobs(str(tmpdir)) == 1
+    assert not os.path.exists(blob_path(str(tmpdir), hexdigest))
+
+
+def test_dedup_uploads(tmpdir):
+    request = dummy_request(tmpdir)
+    request.registry = testing.DummyResource(settings={'phoenix.storage.dedup': 'true'})
+    handle_upload(request, dict(qqfile=dummy_field(b'abc'), qqfilename='tas.nc', qquuid='1'))
+    for index, chunk in enumerate([b'a', b'bc']):
+        handle_upload(request, dict(
+            qqfile=dummy_field(chunk), qqfilename='tas.nc', qquuid='2',
+            qqtotalparts='2', qqpartindex=str(index), qqchunksize=str(len(chunk))))
+    assert os.path.samefile(str(tmpdir.join('1', 'tas.nc')), str(tmpdir.join('2', 'tas.nc')))
+    assert tmpdir.join('2', 'tas.nc.sha256').read() == tmpdir.join('1', 'tas.nc.sha256').read()
+    handle_delete(request, '1')
+    assert tmpdir.join('2', 'tas.nc').read_binary() == b'abc'
+    handle_delete(request, '2')
+    assert not tmpdir.join('.blobs', 'ba').listdir()
+
+
+def test_delete_checks_linked_blobs(tmpdir, monkeypatch):
+    from phoenix.storage import views
+    request = dummy_request(tmpdir)
+    request.registry = testing.DummyResource(settings={'phoenix.storage.dedup': 'true'})
+    handle_upload(request, dict(qqfile=dummy_field(b'abc'), qqfilename='tas.nc', qquuid='1'))
+    handle_upload(request, dict(qqfile=dummy_field(b'def'), qqfilename='tas.nc', qquuid='2'))
+    checked = []
+
+    def collect(base_path, blobs=None):
+        checked.append(blobs)
+        return collect_blobs(base_path, blobs)
+    monkeypatch.setattr(views, 'collect_blobs', collect)
+    handle_delete(request, '1')
+    assert checked == [[blob_path(str(tmpdir), 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad')]]
+    assert not os.path.exists(checked[0][0])
+    assert tmpdir.join('2', 'tas.nc').read_binary() == b'def'
+
+
+def test_delete_ignores_invalid_digest(tmpdir):
+    request = dummy_request(tmpdir)
+    tmpdir.mkdir('etc').join('x').write('keep')
+    tmpdir.mkdir('1').join('tas.nc.sha256').write('ab{}  tas.nc\n'.format(tmpdir.join('etc', 'x')))
+    handle_delete(request, '1')
+    assert tmpdir.join('etc', 'x').read() == 'keep'
+    for uuid in ('.blobs', 'chunks', '..', '1/../etc'):
+        with pytest.raises(ValueError):
+            handle_delete(request, uuid)
+
+
+def download_request(tmpdir, settings=None, **headers):
+    request = Request.blank('/download/storage/1234/tas.nc', headers=headers)
+    request.matchdict = {'filename': '1234/tas.nc'}
+    request.registry = testing.DummyResource(settings=settings or {})
+    request.storage = LocalFileStorage(str(tmpdir), extensions='nc')
+    return request
+
+
+def test_parse_ranges():
+    assert parse_ranges('bytes=0-4', 10) == [(0, 5)]
+    assert parse_ranges('bytes=5-', 10) == [(5, 10)]
+    assert parse_ranges('bytes=-3', 10) == [(7, 10)]
+    assert parse_ranges('bytes=0-1, 8-20', 10) == [(0, 2), (8, 10)]
+    assert parse_ranges('bytes=20-30', 10) == []
+    assert parse_ranges('bytes=5-1', 10) is None
+    assert parse_ranges('lines=1-2', 10) is None
+
+
+def test_download(tmpdir):
+    tmpdir.mkdir('1234').join('tas.nc').write_binary(b'0123456789')
+    response = download(download_request(tmpdir))
+    assert response.status_int == 200
+    assert response.body == b'0123456789'
+    assert response.accept_ranges == 'bytes'
+    etag = response.etag
+    # conditional
+    assert download(download_request(tmpdir, **{'If-None-Match': '"{}"'.format(etag)})).status_int == 304
+    assert download(download_request(tmpdir, **{'If-None-Match': '"other"'})).status_int == 200
+    response = download(download_request(tmpdir, **{'If-Modified-Since': response.headers['Last-Modified']}))
+    assert response.status_int == 304
+    # single range
+    response = download(download_request(tmpdir, Range='bytes=2-4'))
+    assert response.status_int == 206
+    assert response.body == b'234'
+    assert response.headers['Content-Range'] == 'bytes 2-4/10'
+    # range of an outdated version
+    response = download(download_request(tmpdir, Range='bytes=2-4', **{'If-Range': '"other"'}))
+    assert response.status_int == 200
+    # multiple ranges
+    response = download(download_request(tmpdir, Range='bytes=0-1,-2'))
+    assert response.status_int == 206
+    assert response.content_type == 'multipart/byteranges'
+    assert b'Content-Range: bytes 0-1/10\r\n\r\n01\r\n' in response.body
+    assert b'Content-Range: bytes 8-9/10\r\n\r\n89\r\n' in response.body
+    assert len(response.body) == response.content_length
+    # not satisfiable
+    response = download(download_request(tmpdir, Range='bytes=20-'))
+    assert response.status_int == 416
+    assert response.headers['Content-Range'] == 'bytes */10'
+
+
+def test_download_outside_storage(tmpdir):
+    storage = tmpdir.mkdir('storage')
+    storage.mkdir('1234').join('tas.nc').write_binary(b'0123456789')
+    storage.mkdir('.blobs').mkdir('ab').join('cdef').write_binary(b'0123456789')
+    tmpdir.join('secret.nc').write_binary(b'secret')
+    for filename in ['.blobs/ab/cdef', './.blobs/ab/cdef', 'x/../.blobs/ab/cdef', '1234/../.blobs/ab/cdef',
+                     '../secret.nc', '1234/../../secret.nc', str(tmpdir.join('secret.nc'))]:
+        request = download_request(storage)
+        request.matchdict = {'filename': filename}
+        with pytest.raises(HTTPNotFound):
+            download(request)
+    request = download_request(storage)
+    request.matchdict = {'filename': './1234/tas.nc'}
+    assert download(request).body == b'0123456789'
+
+
+def test_download_x_accel_redirect(tmpdir):
+    tmpdir.mkdir('1234').join('tas.nc').write_binary(b'0123456789')
+    response = download(download_request(tmpdir, settings={'phoenix.storage.x_accel_redirect': '/protected/storage/'}))
+    assert response.headers['X-Accel-Redirect'] == '/protected/storage/1234/tas.nc'
+    assert response.body == b''
+
+
+@pytest.mark.slow
+def test_chunked_upload_benchmark(tmpdir, record_property):
+    """
+    Saves and combines a synthetic chunked upload of PHOENIX_TEST_UPLOAD_SIZE bytes,
+    e.g. ``5368709120`` for 5 GB. Records throughput and peak memory as test properties.
+    """
+    if not os.environ.get('PHOENIX_TEST_UPLOAD_SIZE'):
+        pytest.skip("PHOENIX_TEST_UPLOAD_SIZE is not set")
+    total_size = int(os.environ['PHOENIX_TEST_UPLOAD_SIZE'])
+    chunk_size = 64 * 1024 ** 2
+    if shutil.disk_usage(str(tmpdir)).free < 2 * total_size + chunk_size:
+        pytest.skip("not enough disk space")
+    source = tmpdir.join('chunk')
+    source.write_binary(os.urandom(chunk_size))
+    total_parts = (total_size + chunk_size - 1) // chunk_size
+    parts_folder = str(tmpdir.join('chunks', 'parts'))
+    tracemalloc.start()
+    t0 = time.time()
+    for index in range(total_parts):
+        with open(str(source), 'rb') as fp:
+            save_chunk(fp, os.path.join(parts_folder, str(index)))
+    t1 = time.time()
+    dest = str(tmpdir.join('upload', 'data.nc'))
+    combine_chunks(total_parts, parts_folder, dest)
+    t2 = time.time()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size_mb = total_parts * chunk_size / 1024.0 ** 2
+    record_property('size_mb', round(size_mb))
+    record_property('save_mb_per_sec', round(size_mb / (t1 - t0)))
+    record_property('combine_mb_per_sec', round(size_mb / (t2 - t1)))
+    record_property('peak_memory_mb', round(peak / 1024.0 ** 2, 1))
+    assert os.path.getsize(dest) == total_parts * chunk_size
+    assert peak < 16 * 1024 ** 2
@@ -0,0 +1,68 @@
+from phoenix.tasks.utils import snapshot, job_update, save_job, save_log, status_changed
+
+
+class DummyCollection(object):
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, spec, update):
+        self.updates.append((spec, update))
+
+
+def test_job_update():
+    job = dict(_id=1, identifier='1', status='ProcessAccepted', log=['started'], status_message='')
+    stored = snapshot(job)
+    assert job_update(job, stored) == {}
+    job['status'] = 'ProcessStarted'
+    job['log'].append('running')
+    assert job_update(job, stored) == {
+        '$set': {'status': 'ProcessStarted'},
+        '$push': {'log': {'$each': ['running']}}}
+    del job['status_message']
+    assert job_update(job, stored)['$unset'] == {'status_message': ''}
+
+
+def test_status_changed():
+    job = dict(identifier='1', status='ProcessStarted', progress=10, duration='0:00:01')
+    stored = snapshot(job)
+    job['duration'] = '0:00:02'
+    assert status_changed(job, stored) is False
+    job['progress'] = 20
+    assert status_changed(job, stored) is True
+
+
+def test_save_job_fields():
+    collection = DummyCollection()
+    job = dict(identifier='1', status='ProcessStarted', poll_step=0)
+    stored = snapshot(job)
+    job['poll_step'] = 1
+    job['duration'] = '0:00:02'
+    stored = save_job(collection, job, stored, fields=('poll_step',))
+    assert collection.updates == [({'identifier': '1'}, {'$set': {'poll_step': 1}})]
+    assert job_update(job, stored) == {'$set': {'duration': '0:00:02'}}
+
+
+def test_save_job_log():
+    collection = DummyCollection()
+    job = dict(identifier='1', status='ProcessStarted', poll_step=0, log=['0:00:01  10%: running'])
+    stored = snapshot(job)
+    job['poll_step'] = 1
+    job['log'].append('0:00:03  10%: running')
+    stored = save_job(collection, job, stored, fields=('poll_step', 'log'))
+    assert collection.updates == [({'identifier': '1'}, {
+        '$set': {'poll_step': 1},
+        '$push': {'log': {'$each': ['0:00:03  10%: running']}}})]
+    assert job_update(job, stored) == {}
+
+
+def test_save_log():
+    job = dict(identifier='1', status='ProcessStarted', progress=10, status_message='running', duration='0:00:01')
+    save_log(job)
+    stored = snapshot(job)
+    job['duration'] = '0:00:03'
+    save_log(job)
+    assert job['log'] == ['0:00:01  10%: running']
+    assert job_update(job, stored) == {'$set': {'duration': '0:00:03'}}
+    job['progress'] = 20
+    save_log(job)
+    assert job['log'] == ['0:00:01  10%: running', '0:00:03  20%: running']
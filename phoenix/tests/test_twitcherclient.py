@@ -0,0 +1,141 @@
+import time
+import threading
+
+from pyramid import testing
+
+from phoenix import twitcherclient
+from phoenix.catalog import MongodbCatalog
+from phoenix.events import CatalogChanged
+
+
+class DummyTwitcherService(object):
+    def __init__(self):
+        self.calls = 0
+        self.services = [dict(name='emu', url='http://localhost:5000/wps', public=True)]
+
+    def get_service_by_name(self, name):
+        self.calls += 1
+        return [service for service in self.services if service['name'] == name][0]
+
+    def get_service_by_url(self, url):
+        self.calls += 1
+        return [service for service in self.services if service['url'] == url][0]
+
+    def list_services(self):
+        self.calls += 1
+        return self.services
+
+
+class DummyRecord(object):
+    def __init__(self, source):
+        self.source = source
+
+
+class DummyCollection(object):
+    database = testing.DummyResource(catalog_version=None)
+
+
+def test_cached_twitcher_service(monkeypatch):
+    config = testing.setUp()
+    try:
+        service = DummyTwitcherService()
+        monkeypatch.setattr(twitcherclient, 'twitcher_service_factory', lambda registry: service)
+        assert twitcherclient.is_public(config.registry, 'emu') is True
+        assert twitcherclient.is_public(config.registry, 'emu') is True
+        cached = twitcherclient.CachedTwitcherService(config.registry)
+        assert cached.get_service_by_url('http://localhost:5000/wps')['name'] == 'emu'
+        assert service.calls == 1
+        # changes of the service registry clear the cache
+        service.services[0]['public'] = False
+        twitcherclient.invalidate_service_cache(CatalogChanged(config.registry, 'emu'))
+        assert twitcherclient.is_public(config.registry, 'emu') is False
+        assert service.calls == 2
+    finally:
+        testing.tearDown()
+
+
+def test_url_index(monkeypatch):
+    config = testing.setUp()
+    try:
+        service = DummyTwitcherService()
+        service.services.append(dict(name='hummingbird', url='http://localhost:5001/wps', public=False))
+        monkeypatch.setattr(twitcherclient, 'twitcher_service_factory', lambda registry: service)
+        catalog = MongodbCatalog(DummyCollection(), twitcherclient.CachedTwitcherService(config.registry),
+                                 registry=config.registry)
+        for url, name in [('http://localhost:5000/wps', 'emu'), ('http://localhost:5001/wps', 'hummingbird')] * 10:
+            assert catalog.get_service_name(DummyRecord(url)) == name
+        assert twitcherclient.is_public(config.registry, 'emu') is True
+        assert service.calls == 1
+    finally:
+        testing.tearDown()
+
+
+def test_url_index_failure(monkeypatch):
+    config = testing.setUp()
+    try:
+        service = DummyTwitcherService()
+        monkeypatch.setattr(twitcherclient, 'twitcher_service_factory', lambda registry: service)
+        cached = twitcherclient.CachedTwitcherService(config.registry)
+        assert cached.url_index() == {'http://localhost:5000/wps': 'emu'}
+
+        def unavailable():
+            service.calls += 1
+            raise IOError("twitcher is down")
+        service.list_services = unavailable
+        cache = twitcherclient.service_cache(config.registry)
+        cache.invalidate()
+        # the last known index is used and the failure is cached
+        for _ in range(10):
+            assert cached.url_index() == {'http://localhost:5000/wps': 'emu'}
+        assert service.calls == 2
+        cache.timer = lambda: time.time() + twitcherclient.INDEX_RETRY_SECS + 1
+        cached.url_index()
+        assert service.calls == 3
+        # a changed catalog drops the last known index
+        twitcherclient.invalidate_service_cache(CatalogChanged(config.registry, 'emu'))
+        assert cached.url_index() == {}
+    finally:
+        testing.tearDown()
+
+
+def test_twitcher_service_factory(monkeypatch):
+    config = testing.setUp(settings={'twitcher.url': 'https://localhost:8443'})
+    try:
+        monkeypatch.setattr(twitcherclient, 'TwitcherService', lambda url, verify: DummyTwitcherService())
+        services = []
+        threads = [threading.Thread(target=lambda: services.append(
+            twitcherclient.twitcher_service_factory(config.registry))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(id(service) for service in services)) == 1
+        assert services[0].list_services()[0]['name'] == 'emu'
+    finally:
+        testing.tearDown()
+
+
+def test_twitcher_service_pool(monkeypatch):
+    clients = []
+
+    class BlockingTwitcherService(DummyTwitcherService):
+        def __init__(self):
+            super(BlockingTwitcherService, self).__init__()
+            clients.append(self)
+
+        def generate_token(self, release):
+            release.wait(5)
+            return {'access_token': 'abc'}
+    monkeypatch.setattr(twitcherclient, 'TwitcherService', lambda url, verify: BlockingTwitcherService())
+    pool = twitcherclient.TwitcherServicePool('https://localhost:8443')
+    release = threading.Event()
+    # a hanging call does not block other calls
+    thread = threading.Thread(target=pool.generate_token, args=(release,))
+    thread.start()
+    assert pool.list_services()[0]['name'] == 'emu'
+    assert len(clients) == 2
+    release.set()
+    thread.join()
+    # idle clients are reused
+    pool.list_services()
+    assert len(clients) == 2
@@ -36,3 +36,40 @@ def test_format_tags():
     assert utils.format_tags(['public', 'dev']) == 'public, dev'
     assert utils.format_tags(None) == ''
     assert utils.format_tags([]) == ''
+
+
+def test_pinned_processes(monkeypatch):
+    import time
+    from concurrent.futures import wait
+    from pyramid import testing
+
+    def describe(request, service_name, identifier):
+        if identifier == 'slow':
+            time.sleep(1)
+        return dict(title=identifier, description='', service_title=service_name, available=True)
+    monkeypatch.setattr(utils, '_describe_pinned', describe)
+
+    class Settings(object):
+        def find_one(self):
+            return {'pinned_processes': ['emu.hello', 'emu.slow']}
+    config = testing.setUp(settings={'phoenix.pinned_processes.timeout': '0.1'})
+    config.add_route('processes_execute', '/processes/execute')
+    request = testing.DummyRequest()
+    settings = Settings()
+    request.db = testing.DummyResource(settings=settings)
+    try:
+        processes = utils.pinned_processes(request)
+        assert [p['title'] for p in processes] == ['hello', 'slow']
+        assert processes[0]['available'] is True
+        assert processes[1]['available'] is False
+        assert processes[1]['url'] == '/processes/execute?wps=emu&process=slow'
+        # the slow service is not asked again while its request is running
+        settings.find_one = lambda: {'pinned_processes': ['hummingbird.hello', 'emu.hello']}
+        processes = utils.pinned_processes(request)
+        assert processes[0]['available'] is True
+        assert processes[1]['available'] is False
+        # only running requests are kept
+        wait([future for _, future in request.registry.pinned_futures.values()])
+        assert utils._pinned_futures(request.registry) == {}
+    finally:
+        testing.tearDown()
@@ -12,3 +12,74 @@ def test_check_status():
     assert execution.isSucceded()
     assert execution.statusLocation ==\
         'https://localhost:28090/wpsoutputs/hummingbird/56cd4294-bd69-11e6-80fe-68f72837e1b4.xml'
+
+
+def test_execution_data():
+    doc = etree.parse(WPS_RESPONSE_XML)
+    execution = wps.check_status(response=etree.tostring(doc), sleep_secs=0)
+    data = wps.execution_data(execution)
+    assert [inp['identifier'] for inp in data['inputs']] == ['test', 'dataset']
+    assert data['inputs'][0]['data'] == ['CF-1.6']
+    assert data['inputs'][1]['mime_type'] == 'application/x-netcdf'
+    assert data['outputs'][0]['identifier'] == 'output'
+    assert data['outputs'][0]['reference'] ==\
+        'https://localhost:28090/wpsoutputs/hummingbird/reportVkLP1x.html'
+
+
+def test_job_data():
+    stored = {'outputs': [{'identifier': 'output'}]}
+    job = dict(identifier='1', status='ProcessSucceeded', **stored)
+    # stored data is used without database access
+    assert wps.job_data(None, job, 'outputs') == stored['outputs']
+
+
+class DummyInput(object):
+    def __init__(self, identifier, dataType, mime_types=None, **kwargs):
+        self.identifier = identifier
+        self.title = identifier
+        self.abstract = ''
+        self.dataType = dataType
+        self.minOccurs = 1
+        self.maxOccurs = 1
+        self.defaultValue = None
+        self.allowedValues = []
+        self.supportedValues = [DummyInput(mime_type, 'ComplexData') for mime_type in mime_types or []]
+        self.mimeType = identifier
+        self.metadata = []
+        self.__dict__.update(kwargs)
+
+
+class DummyProcess(object):
+    identifier = 'hello'
+
+    def __init__(self, data_inputs):
+        self.dataInputs = data_inputs
+
+
+def test_wps_schema():
+    from pyramid import testing
+    config = testing.setUp()
+    config.testing_securitypolicy(userid='alice', permissive=True)
+    process = DummyProcess([
+        DummyInput('name', 'string'),
+        DummyInput('credentials', 'ComplexData', mime_types=['application/x-pkcs7-mime']),
+    ])
+    request = testing.DummyRequest()
+    request.storage = testing.DummyResource(base_url='http://localhost/download/storage/')
+    request.max_file_size = 200
+    try:
+        schema = wps.wps_schema(request, 'emu', process, user={'credentials': 'http://localhost/cert.pem'})
+        assert [node.name for node in schema.children] == ['csrf_token', 'name', 'credentials']
+        assert schema['credentials'].default == 'http://localhost/cert.pem'
+        assert schema.request is request
+        other = wps.wps_schema(request, 'emu', process)
+        assert other['credentials'].default is not schema['credentials'].default
+        assert wps.schema_cache(request.registry).stats()['hits'] == 1
+    finally:
+        testing.tearDown()
+
+
+def test_process_hash():
+    process = DummyProcess([DummyInput('name', 'string')])
+    assert wps.process_hash(process) == wps.process_hash(DummyProcess([DummyInput('name', 'string')]))
+    assert wps.process_hash(process) != wps.process_hash(DummyProcess([DummyInput('name', 'integer')]))
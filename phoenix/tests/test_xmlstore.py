@@ -0,0 +1,34 @@
+from phoenix import xmlstore
+
+
+class DummyCollection(object):
+    def __init__(self):
+        self.docs = {}
+
+    def update_one(self, spec, update, upsert=False):
+        self.docs.setdefault(spec['identifier'], dict(spec)).update(update['$set'])
+
+    def find_one(self, spec, projection=None):
+        return self.docs.get(spec['identifier'])
+
+
+class DummyDB(object):
+    def __init__(self):
+        self.job_xml = DummyCollection()
+
+
+def test_save_and_load_xml():
+    db = DummyDB()
+    xml = b'<wps:ExecuteResponse>' + b'<wps:Output/>' * 100 + b'</wps:ExecuteResponse>'
+    xmlstore.save_xml(db, '1', request='<wps:Execute/>', response=xml)
+    assert len(db.job_xml.docs['1']['response']) < len(xml)
+    assert xmlstore.load_xml(db, '1') == xml
+    assert xmlstore.load_xml(db, '1', field='request') == b'<wps:Execute/>'
+    assert xmlstore.load_xml(db, '2') is None
+
+
+def test_job_response():
+    db = DummyDB()
+    xmlstore.save_xml(db, '1', response=b'<stored/>')
+    assert xmlstore.job_response(db, {'identifier': '1'}) == b'<stored/>'
+    assert xmlstore.job_response(db, {'identifier': '1', 'response': b'<inline/>'}) == b'<inline/>'
@@ -1,10 +1,15 @@
+import queue
+import threading
 from urllib.parse import urlparse
 
+from pyramid.events import subscriber
 from pyramid.settings import asbool
 
 from twitcher.client import TwitcherService
 
+from phoenix.cache import cache_factory
 from phoenix.db import mongodb
+from phoenix.events import CatalogChanged
 from phoenix.esgf.slcsclient import refresh_token
 
 import logging
@@ -22,10 +27,145 @@ def includeme(config):
         config.include('twitcher.tweens')
 
 
+_lock = threading.Lock()
+_marker = object()
+# seconds until the service list is fetched again after a failed call
+INDEX_RETRY_SECS = 30
+# number of idle twitcher clients kept per worker
+POOL_SIZE = 10
+
+
+def _set_timeout(client, timeout):
+    """Sets the socket timeout of the XML-RPC connections of ``client``."""
+    server = getattr(client, 'server', None)
+    if server is None:
+        return
+    transport = server('transport')
+    make_connection = transport.make_connection
+
+    def make_connection_with_timeout(host):
+        connection = make_connection(host)
+        connection.timeout = timeout
+        return connection
+    transport.make_connection = make_connection_with_timeout
+
+
+class TwitcherServicePool(object):
+    """
+    Pool of twitcher clients of a worker. Each call takes an idle client, so
+    concurrent requests do not wait for each other, and gives it back when
+    the call succeeded, so its connection to twitcher is reused.
+    """
+    def __init__(self, url, timeout=10, size=POOL_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.clients = queue.LifoQueue(maxsize=size)
+
+    def _client(self):
+        try:
+            return self.clients.get_nowait()
+        except queue.Empty:
+            client = TwitcherService(url=self.url, verify=False)
+            _set_timeout(client, self.timeout)
+            return client
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            client = self._client()
+            result = getattr(client, name)(*args, **kwargs)
+            try:
+                self.clients.put_nowait(client)
+            except queue.Full:
+                pass
+            return result
+        return call
+
+
 def twitcher_service_factory(registry):
-    settings = registry.settings
-    service = TwitcherService(url=settings.get('twitcher.url'), verify=False)
-    return service
+    """
+    Returns the twitcher client pool of this worker. It is kept at the
+    registry, so the connections to twitcher are reused between calls.
+    Calls time out after ``twitcher.timeout`` seconds (default: 10).
+    """
+    url = registry.settings.get('twitcher.url')
+    services = getattr(registry, 'twitcher_services', None)
+    if services is None or url not in services:
+        with _lock:
+            if getattr(registry, 'twitcher_services', None) is None:
+                registry.twitcher_services = {}
+            if url not in registry.twitcher_services:
+                registry.twitcher_services[url] = TwitcherServicePool(
+                    url, timeout=float(registry.settings.get('twitcher.timeout', '10')))
+    return registry.twitcher_services[url]
+
+
+def service_cache(registry):
+    return cache_factory(registry, 'twitcher', ttl=300, max_size=512)
+
+
+@subscriber(CatalogChanged)
+def invalidate_service_cache(event):
+    service_cache(event.registry).invalidate()
+    # removed services must not come back from the fallback index
+    event.registry.twitcher_index = {}
+
+
+class CachedTwitcherService(object):
+    """
+    Twitcher client which caches the service records by name and url.
+    The cache is cleared when services are registered or removed (see ``CatalogChanged``).
+    """
+    def __init__(self, registry):
+        self.registry = registry
+
+    @property
+    def service(self):
+        return twitcher_service_factory(self.registry)
+
+    def _get(self, key, fetch):
+        cache = service_cache(self.registry)
+        record = cache.get(key, _marker)
+        if record is _marker:
+            record = cache.set(key, fetch())
+            if record:
+                cache.set(('name', record.get('name')), record)
+                cache.set(('url', record.get('url')), record)
+        return record
+
+    def get_service_by_name(self, name):
+        return self._get(('name', name), lambda: self.service.get_service_by_name(name))
+
+    def get_service_by_url(self, url):
+        return self._get(('url', url), lambda: self.service.get_service_by_url(url))
+
+    def url_index(self):
+        """
+        Returns the index url -> service name of all services registered at twitcher.
+        The whole service list is fetched with a single call.
+
+        If twitcher can not be reached, the last known index is used and the
+        call is retried after ``INDEX_RETRY_SECS`` seconds.
+        """
+        cache = service_cache(self.registry)
+        index = cache.get(('index',), _marker)
+        if index is not _marker:
+            return index
+        try:
+            services = self.service.list_services() or []
+        except Exception:
+            LOGGER.exception("could not list services, using the last known services.")
+            return cache.set(('index',), getattr(self.registry, 'twitcher_index', {}), ttl=INDEX_RETRY_SECS)
+        index = {}
+        for record in services:
+            cache.set(('name', record.get('name')), record)
+            cache.set(('url', record.get('url')), record)
+            index[record.get('url')] = record.get('name')
+        self.registry.twitcher_index = index
+        return cache.set(('index',), index)
+
+    def __getattr__(self, name):
+        # all other calls go to twitcher
+        return getattr(self.service, name)
 
 
 def generate_access_token(registry, userid, valid_in_hours=1):
@@ -58,6 +198,5 @@ def generate_access_token(registry, userid, valid_in_hours=1):
 
 
 def is_public(registry, name):
-    srv = twitcher_service_factory(registry)
-    service = srv.get_service_by_name(name)
+    service = CachedTwitcherService(registry).get_service_by_name(name)
     return service.get('public', False)
@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime
 from urllib.parse import urlparse, urlencode
 
@@ -45,29 +46,96 @@ class ActionButton(object):
 # processes
 
 
+_executors = {}
+_lock = threading.Lock()
+
+
+def executor(name, max_workers=4):
+    """
+    Returns the thread pool ``name`` for concurrent calls to remote services.
+
+    Each feature has its own bounded pool, so slow services of one feature do
+    not hold the threads of another.
+    """
+    if name not in _executors:
+        from concurrent.futures import ThreadPoolExecutor
+        _executors.setdefault(name, ThreadPoolExecutor(max_workers=max_workers))
+    return _executors[name]
+
+
+def _pinned_futures(registry):
+    """
+    Returns the running description requests of this registry as
+    name -> (service_name, future). Finished requests are dropped.
+    """
+    with _lock:
+        futures = getattr(registry, 'pinned_futures', None)
+        if futures is None:
+            futures = registry.pinned_futures = {}
+        for name, (_, future) in list(futures.items()):
+            if future.done():
+                del futures[name]
+    return futures
+
+
+def _describe_pinned(request, service_name, identifier):
+    from phoenix.wps import get_wps, describe_process
+    wps = get_wps(request, service_name)
+    process = describe_process(request, service_name, identifier)
+    return dict(
+        title=process.identifier,
+        description=headline(process.abstract),
+        service_title=wps.identification.title,
+        available=True)
+
+
 def pinned_processes(request):
-    from owslib.wps import WebProcessingService
+    """
+    Returns the pinned processes with their descriptions.
+
+    Descriptions are fetched concurrently. Processes which are not described
+    within ``phoenix.pinned_processes.timeout`` seconds (default: 5) are shown
+    as unavailable. Services which have not answered an earlier request yet
+    are not asked again until they do.
+    """
+    from concurrent.futures import wait
     settings = request.db.settings.find_one() or {}
-    processes = []
-    if 'pinned_processes' in settings:
-        for pinned in settings.get('pinned_processes'):
-            try:
-                service_name, identifier = pinned.split('.', 1)
-                url = request.route_path(
-                    'processes_execute', _query=[('wps', service_name), ('process', identifier)])
-                wps = WebProcessingService(
-                    url=request.route_url('owsproxy', service_name=service_name), verify=False)
-                # TODO: need to fix owslib to handle special identifiers
-                process = wps.describeprocess(identifier)
-                description = headline(process.abstract)
-            except Exception:
-                LOGGER.warn("could not add pinned process %s", pinned)
+    timeout = float(request.registry.settings.get('phoenix.pinned_processes.timeout', '5'))
+    futures = _pinned_futures(request.registry)
+    busy = set(service_name for service_name, future in futures.values() if not future.done())
+    pinned = []
+    for name in settings.get('pinned_processes', []):
+        try:
+            service_name, identifier = name.split('.', 1)
+        except ValueError:
+            LOGGER.warn("could not add pinned process %s", name)
+        else:
+            if service_name in busy:
+                # the service did not answer an earlier request yet
+                future = None
             else:
-                processes.append(dict(
-                    title=process.identifier,
-                    description=description,
-                    url=url,
-                    service_title=wps.identification.title))
+                future = executor('pinned_processes').submit(_describe_pinned, request, service_name, identifier)
+                futures[name] = (service_name, future)
+            pinned.append((name, service_name, identifier, future))
+    wait([future for _, _, _, future in pinned if future is not None], timeout=timeout)
+    processes = []
+    for name, service_name, identifier, future in pinned:
+        process = dict(
+            title=identifier,
+            description="Process is currently not available.",
+            service_title=service_name,
+            available=False)
+        if future is None:
+            LOGGER.warn("service of pinned process %s is still busy", name)
+        elif not future.done():
+            LOGGER.warn("timeout while describing pinned process %s", name)
+        elif future.exception() is not None:
+            LOGGER.warn("could not add pinned process %s", name)
+        else:
+            process = future.result()
+        process['url'] = request.route_path(
+            'processes_execute', _query=[('wps', service_name), ('process', identifier)])
+        processes.append(process)
     return processes
 
 
@@ -78,6 +78,15 @@ def robotstxt_view(request):
     return _robots_response
 
 
+@view_config(name='cache_stats.json', renderer='json', permission='admin')
+def cache_stats_view(request):
+    from phoenix.cache import cache_stats
+    from phoenix.esgf.cache import esgf_cache
+    stats = cache_stats(request.registry)
+    stats['esgf'] = esgf_cache(request).stats()
+    return stats
+
+
 @view_defaults(permission='view', layout='default')
 class Home(object):
     def __init__(self, request):
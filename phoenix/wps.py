@@ -1,4 +1,5 @@
 import os
+import hashlib
 import colander
 import deform
 import dateutil
@@ -9,9 +10,15 @@ import requests
 from lxml import etree
 
 from owslib.wps import WPSExecution
+from owslib.wps import WebProcessingService
 
+from pyramid.events import subscriber
 from pyramid.security import authenticated_userid
 
+from phoenix.cache import cache_factory
+from phoenix.events import CatalogChanged
+from phoenix.xmlstore import job_response
+
 from phoenix.geoform.widget import BBoxWidget, ResourceWidget
 from phoenix.geoform.form import BBoxValidator
 from phoenix.geoform.form import URLValidator
@@ -58,6 +65,97 @@ def check_status(url=None, response=None, sleep_secs=2, verify=False):
     return execution
 
 
+# parsed inputs and outputs of jobs
+# ---------------------------------
+
+RUNNING = ['ProcessAccepted', 'ProcessPaused', 'ProcessStarted']
+FINISHED = ['ProcessSucceeded', 'ProcessFailed']
+
+
+def data_as_dict(item):
+    """
+    Returns a JSON-serializable dict of an input or output of a WPS execution.
+    Bounding boxes are converted to ``minx,miny,maxx,maxy`` strings.
+    """
+    if item.dataType == 'BoundingBoxData':
+        data = ["{0.minx},{0.miny},{0.maxx},{0.maxy}".format(bbox) for bbox in item.data]
+    else:
+        data = [str(value) for value in item.data if value is not None]
+    return dict(identifier=item.identifier,
+                title=item.title,
+                abstract=item.abstract,
+                mime_type=item.mimeType,
+                data_type=item.dataType,
+                data=data,
+                reference=item.reference)
+
+
+def execution_data(execution):
+    """
+    Returns the ``inputs`` and ``outputs`` of a WPS execution as stored on the job.
+    """
+    return dict(inputs=[data_as_dict(inp) for inp in execution.dataInputs],
+                outputs=[data_as_dict(output) for output in execution.processOutputs])
+
+
+def job_data(db, job, key='outputs'):
+    """
+    Returns the stored ``inputs`` or ``outputs`` of ``job``.
+
+    Jobs finished before these were stored are parsed once from their
+    status document and updated, finished jobs do not change anymore.
+    """
+    if key not in job:
+        execution = check_status(url=job.get('status_location'),
+                                 response=job_response(db, job), sleep_secs=0)
+        data = execution_data(execution)
+        if job.get('status') in FINISHED:
+            db.jobs.update_one({'identifier': job['identifier']}, {'$set': data})
+        job.update(data)
+    return job[key]
+
+
+# wps capabilities and process descriptions
+# -----------------------------------------
+
+
+def wps_cache(registry):
+    return cache_factory(registry, 'wps', ttl=600, max_size=256)
+
+
+def get_wps(request, service_name):
+    """
+    Returns a ``WebProcessingService`` with parsed capabilities for the given service name.
+    The instance is cached and shared by all requests, so don't modify it.
+    """
+    url = request.route_url('owsproxy', service_name=service_name)
+
+    def create():
+        return WebProcessingService(url=url, verify=False)
+    return wps_cache(request.registry).get_or_create((service_name, url, None), create)
+
+
+def describe_process(request, service_name, identifier):
+    """
+    Returns the cached process description of process ``identifier``.
+    """
+    url = request.route_url('owsproxy', service_name=service_name)
+
+    def create():
+        # TODO: need to fix owslib to handle special identifiers
+        return get_wps(request, service_name).describeprocess(identifier)
+    return wps_cache(request.registry).get_or_create((service_name, url, identifier), create)
+
+
+@subscriber(CatalogChanged)
+def invalidate_wps_cache(event):
+    for cache in (wps_cache(event.registry), schema_cache(event.registry)):
+        if event.service_name is None:
+            cache.invalidate()
+        else:
+            cache.invalidate_matching(lambda key: key[0] == event.service_name)
+
+
 def appstruct_to_inputs(request, appstruct):
     """
     Transforms appstruct to wps inputs.
@@ -118,6 +216,8 @@ class WPSSchema(deform.schema.CSRFSchema):
         self.process = process
         self.user = user
         self.kwargs = kwargs or {}
+        # names of nodes which take the user credentials as default
+        self.credentials_nodes = []
         if use_async:
             self.add_async_check()
         self.add_nodes(process)
@@ -291,6 +391,8 @@ class WPSSchema(deform.schema.CSRFSchema):
             default=self._url_node_default(data_input),
             validator=URLValidator(),
         )
+        if 'application/x-pkcs7-mime' in mime_types:
+            self.credentials_nodes.append(data_input.identifier)
 
         # sequence of nodes ...
         if data_input.maxOccurs > 1:
@@ -330,18 +432,66 @@ class WPSSchema(deform.schema.CSRFSchema):
 
     def bind(self, **kw):
         cloned = self.clone()
+        cloned.request = kw.get('request', self.request)
+        cloned.user = kw.get('user', self.user)
         cloned._bind(kw)
+        cloned.set_credentials_defaults()
 
         LOGGER.debug('after bind: num schema children = %s', len(cloned.children))
         return cloned
 
+    def set_credentials_defaults(self):
+        """Use the credentials of the current user as default for certificate inputs."""
+        if self.user is None:
+            return
+        for name in self.credentials_nodes:
+            node = self[name]
+            if isinstance(node.typ, colander.Sequence):
+                node = node.children[0]
+            # TODO: check if certificate is still valid
+            node.default = self.user.get('credentials')
+
     def clone(self):
-        cloned = self.__class__(
-            self.request,
-            self.hide_complex,
-            self.process,
-            self.user,
-            **self.kwargs)
+        # don't call __init__ ... it would build all nodes again
+        cloned = object.__new__(self.__class__)
         cloned.__dict__.update(self.__dict__)
         cloned.children = [node.clone() for node in self.children]
         return cloned
+
+
+def process_hash(process):
+    """Returns a digest of the data inputs of a process description."""
+    def values(items):
+        return [getattr(item, 'mimeType', item) for item in items or []]
+    md5 = hashlib.md5()
+    for inp in getattr(process, 'dataInputs', []):
+        md5.update(repr((
+            inp.identifier, inp.title, getattr(inp, 'abstract', None), inp.dataType,
+            inp.minOccurs, inp.maxOccurs, getattr(inp, 'defaultValue', None),
+            values(getattr(inp, 'allowedValues', None)),
+            values(getattr(inp, 'supportedValues', None)),
+            [metadata.title for metadata in getattr(inp, 'metadata', [])],
+        )).encode('utf-8'))
+    return md5.hexdigest()
+
+
+def schema_cache(registry):
+    return cache_factory(registry, 'wps_schema', ttl=3600, max_size=128)
+
+
+def wps_schema(request, service_name, process, use_async=False, user=None):
+    """
+    Returns a ``WPSSchema`` for ``process`` bound to ``request``.
+
+    The schema tree is built once for each process description and set of
+    permissions. Requests get a bound copy with the defaults of ``user``.
+    """
+    key = (service_name, process.identifier, process_hash(process),
+           bool(request.has_permission('edit')), bool(use_async))
+
+    def create():
+        schema = WPSSchema(request=request, process=process, use_async=use_async)
+        schema.request = None  # don't keep the request in the cache
+        return schema
+    template = schema_cache(request.registry).get_or_create(key, create)
+    return template.bind(request=request, user=user)
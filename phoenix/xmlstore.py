@@ -0,0 +1,94 @@
+"""
+Compressed storage of the WPS request and response documents of jobs.
+
+The documents are kept zlib compressed in the ``job_xml`` collection and
+are referenced by the job identifier, so the job documents only keep the
+status fields used by the monitor and dashboard.
+"""
+
+import argparse
+import zlib
+
+from bson.binary import Binary
+
+import logging
+LOGGER = logging.getLogger("PHOENIX")
+
+XML_FIELDS = ('request', 'response')
+
+
+def _compress(xml):
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+    return Binary(zlib.compress(xml))
+
+
+def save_xml(db, identifier, **documents):
+    """
+    Stores the given ``request`` and/or ``response`` documents of job ``identifier``.
+    """
+    fields = dict((key, _compress(value)) for key, value in documents.items()
+                  if key in XML_FIELDS and value is not None)
+    if fields:
+        db.job_xml.update_one({'identifier': identifier}, {'$set': fields}, upsert=True)
+
+
+def load_xml(db, identifier, field='response'):
+    """
+    Returns the uncompressed ``field`` document of job ``identifier`` or None.
+    """
+    doc = db.job_xml.find_one({'identifier': identifier}, {field: 1})
+    if doc and doc.get(field):
+        return zlib.decompress(doc[field])
+    return None
+
+
+def job_response(db, job):
+    """
+    Returns the latest response document of ``job``. Jobs which were not
+    compacted yet still have it inline.
+    """
+    if job.get('response'):
+        return job['response']
+    return load_xml(db, job['identifier'])
+
+
+def delete_xml(db, identifiers):
+    db.job_xml.delete_many({'identifier': {'$in': list(identifiers)}})
+
+
+def compact_jobs(db, batch_size=1000):
+    """
+    Moves inline request and response documents of existing jobs to the
+    compressed store. Returns the number of compacted jobs.
+    """
+    count = 0
+    search_filter = {'$or': [{field: {'$exists': True}} for field in XML_FIELDS]}
+    projection = dict((field, 1) for field in XML_FIELDS)
+    projection['identifier'] = 1
+    for job in db.jobs.find(search_filter, projection).batch_size(batch_size):
+        save_xml(db, job['identifier'], **dict((field, job.get(field)) for field in XML_FIELDS))
+        db.jobs.update_one(
+            {'_id': job['_id']},
+            {'$unset': dict((field, '') for field in XML_FIELDS)})
+        count += 1
+        if count % batch_size == 0:
+            LOGGER.info("compacted %d jobs ...", count)
+    return count
+
+
+def main(argv=None):
+    from pyramid.paster import bootstrap, setup_logging
+    from phoenix.db import mongodb
+
+    parser = argparse.ArgumentParser(description="Move XML documents of jobs to the compressed store.")
+    parser.add_argument('config_uri', help="Phoenix configuration file, e.g. phoenix.ini")
+    args = parser.parse_args(argv)
+
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+    try:
+        count = compact_jobs(mongodb(env['registry']))
+        print("Compacted {} jobs.".format(count))
+    finally:
+        env['closer']()
@@ -33,5 +33,9 @@ setup(name='Phoenix',
       entry_points="""\
       [paste.app_factory]
       main = phoenix:main
+      [console_scripts]
+      phoenix-poller = phoenix.tasks.poller:main
+      phoenix-compact-jobs = phoenix.xmlstore:main
+      phoenix-db-indexes = phoenix.db:main
       """,
       )